@@ -1,6 +1,8 @@
 # Import dependencies
 from ollama_integration import generate_structured_response
-from typing import Dict, List
+from ai_systems.combat_policy import CombatPolicy
+from perf_metrics import PERF
+from typing import Dict, List, Optional
 import random
 
 
@@ -13,9 +15,24 @@ class TacticalCombatAI:
             "defensive": ["block", "counter", "heal"],
             "tactical":  ["assess", "flank", "exploit_weakness"]
         }
+        # Local decision table; the LLM is only consulted for close calls in unseen states
+        self.policy = CombatPolicy(self.behaviors, difficulty)
 
     # Decide which action the enemy should take this turn
     def decide_action(self, combat_state: Dict) -> str:
+        # Callers don't always know max HP; treat current HP as full health then
+        combat_state = dict(combat_state)
+        combat_state.setdefault('player_max_hp', combat_state['player_hp'])
+        combat_state.setdefault('enemy_max_hp', combat_state['enemy_hp'])
+        try:
+            with PERF.measure("combat.decide_action"):
+                return self.policy.decide(combat_state, escalate=self._ask_llm)
+        except Exception:
+            # If the policy fails, fall back to rule‑based logic
+            return self._fallback_action(combat_state)
+
+    # Ask the language model; None when it is unavailable or answers off-list
+    def _ask_llm(self, combat_state: Dict) -> Optional[str]:
         # Compose an instruction for the language model
         prompt = f"""As a {self.difficulty} combat AI, choose the best action from {self.behaviors}.
 
@@ -26,19 +43,15 @@ Current state:
 - Available actions: {combat_state['available_actions']}
 
 Respond ONLY with one action from the list above."""
-        try:
-            # Ask the LLM for its choice
-            llm_reply = generate_structured_response(prompt)
-            # Verify reply is legal; if not, fix it
-            return self._validate_action(llm_reply, combat_state['available_actions'])
-        except Exception:
-            # If the call fails, fall back to rule‑based logic
-            return self._fallback_action(combat_state)
+        llm_reply = generate_structured_response(prompt, call_site="tactical_combat")
+        if not llm_reply:
+            return None
+        return self._validate_action(llm_reply, combat_state['available_actions'])
 
     # Check that the model’s answer is among allowed actions
-    def _validate_action(self, response: str, valid_actions: List[str]) -> str:
+    def _validate_action(self, response: str, valid_actions: List[str]) -> Optional[str]:
         action = response.strip().lower()
-        return action if action in valid_actions else random.choice(valid_actions)
+        return action if action in valid_actions else None
 
     # Simple backup logic if the LLM doesn’t respond or returns junk
     def _fallback_action(self, combat_state: Dict) -> str:
@@ -0,0 +1,136 @@
+import random
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Discretization of the combat state used as the policy table key
+HP_BUCKETS = 4  # 0-25%, 25-50%, 50-75%, 75-100%
+CONFIDENT_MARGIN = 0.25  # utility lead that settles an unseen bucket without asking the LLM
+
+# Actions that aren't listed in the behavior presets but show up in enemy action lists
+EXTRA_ACTION_FAMILIES = {
+    "defend": "defensive",
+    "flee": "defensive",
+    "special": "tactical"
+}
+
+# Per enemy type leanings, matched as substrings of the type name
+ENEMY_TYPE_BIAS = {
+    "beast": {"aggressive": 0.2, "tactical": -0.1},
+    "wolf": {"aggressive": 0.2, "tactical": -0.1},
+    "undead": {"aggressive": 0.1, "defensive": -0.2},
+    "skeleton": {"aggressive": 0.1, "defensive": -0.2},
+    "goblin": {"tactical": 0.1, "defensive": 0.1},
+    "mage": {"tactical": 0.2, "aggressive": -0.1},
+    "guard": {"defensive": 0.2}
+}
+
+# How far each difficulty trusts the best-scoring action (easy enemies make more mistakes)
+DIFFICULTY_NOISE = {"easy": 0.3, "normal": 0.1, "hard": 0.0}
+
+Bucket = Tuple[int, int, str, Tuple[str, ...]]
+
+
+def hp_bucket(hp: float, max_hp: float) -> int:
+    # Index of the HP quarter the ratio falls into
+    if not max_hp or max_hp <= 0:
+        return HP_BUCKETS - 1
+    ratio = max(0.0, min(1.0, hp / max_hp))
+    return min(HP_BUCKETS - 1, int(ratio * HP_BUCKETS))
+
+
+class CombatPolicy:
+    # Utility-scored enemy decisions, memoized per discretized combat state
+    def __init__(self, behaviors: Dict[str, List[str]], difficulty: str = "normal", seed: Optional[int] = None):
+        self.behaviors = behaviors
+        self.difficulty = difficulty
+        self.table: Dict[Bucket, str] = {}  # bucket -> decided action
+        self.stats = {"memo_hits": 0, "local": 0, "escalations": 0, "escalation_failures": 0}
+        self._families = {action: family for family, actions in behaviors.items() for action in actions}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def bucket(self, combat_state: Dict) -> Bucket:
+        return (
+            hp_bucket(combat_state['player_hp'], combat_state.get('player_max_hp', combat_state['player_hp'])),
+            hp_bucket(combat_state['enemy_hp'], combat_state.get('enemy_max_hp', combat_state['enemy_hp'])),
+            str(combat_state.get('enemy_type', '')).lower(),
+            tuple(sorted(combat_state['available_actions']))
+        )
+
+    def family(self, action: str) -> str:
+        return self._families.get(action) or EXTRA_ACTION_FAMILIES.get(action, "tactical")
+
+    def score(self, combat_state: Dict) -> Dict[str, float]:
+        # Utility of every available action from HP ratios, enemy type and difficulty
+        player_ratio = combat_state['player_hp'] / max(1, combat_state.get('player_max_hp', combat_state['player_hp']))
+        enemy_ratio = combat_state['enemy_hp'] / max(1, combat_state.get('enemy_max_hp', combat_state['enemy_hp']))
+        enemy_type = str(combat_state.get('enemy_type', '')).lower()
+
+        family_utility = {
+            # Press the attack when the player is weak or the enemy is still healthy
+            "aggressive": 0.4 + 0.4 * (1 - player_ratio) + 0.2 * enemy_ratio,
+            # Turtle up once the enemy is hurt, harder the closer to death it is
+            "defensive": 0.2 + 0.7 * (1 - enemy_ratio),
+            # Probe for openings while both sides are healthy
+            "tactical": 0.3 + 0.3 * min(player_ratio, enemy_ratio)
+        }
+        for type_name, bias in ENEMY_TYPE_BIAS.items():
+            if type_name in enemy_type:
+                for family, delta in bias.items():
+                    family_utility[family] = family_utility.get(family, 0.0) + delta
+
+        scores = {}
+        for action in combat_state['available_actions']:
+            utility = family_utility.get(self.family(action), 0.3)
+            if action == "flee":
+                utility -= 0.3 if enemy_ratio >= 0.3 else 0.0  # only worth it when nearly dead
+            scores[action] = round(utility, 4)
+        return scores
+
+    def best_local(self, combat_state: Dict) -> Tuple[str, float]:
+        # Highest-utility action and its lead over the runner-up
+        scores = self.score(combat_state)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        margin = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else 1.0
+        return ranked[0][0], margin
+
+    def _with_mistakes(self, action: str, combat_state: Dict) -> str:
+        # Rolled every turn on top of the memoized decision, so a mistake never sticks to a bucket
+        noise = DIFFICULTY_NOISE.get(self.difficulty, 0.1)
+        if not noise or self._rng.random() >= noise:
+            return action
+        others = sorted(((utility, other) for other, utility in self.score(combat_state).items() if other != action),
+                        reverse=True)
+        return others[0][1] if others else action  # a deliberate mistake: the runner-up
+
+    def decide(self, combat_state: Dict, escalate: Callable[[Dict], Optional[str]] = None) -> str:
+        # Memoized bucket -> local utility -> LLM, in that order of preference
+        key = self.bucket(combat_state)
+        with self._lock:
+            action = self.table.get(key)
+            if action is not None:
+                self.stats["memo_hits"] += 1
+        if action is not None:
+            return self._with_mistakes(action, combat_state)
+
+        action, margin = self.best_local(combat_state)
+        if escalate is None or margin >= CONFIDENT_MARGIN:
+            outcome = "local"
+        else:
+            suggestion = escalate(combat_state)
+            if suggestion in combat_state['available_actions']:
+                action, outcome = suggestion, "escalations"
+            else:
+                outcome = "escalation_failures"  # model down or off-list: ask again next time
+
+        with self._lock:
+            self.stats[outcome] += 1
+            if outcome != "escalation_failures":
+                self.table[key] = action
+        return self._with_mistakes(action, combat_state)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["table_size"] = len(self.table)
+        return stats
@@ -0,0 +1,199 @@
+# Headless combat simulator for balance runs.
+#
+# Plays many fights at once with NumPy arrays instead of one interactive fight
+# at a time. The rules mirror DungeonMaster.handle_combat_action: the player
+# always attacks, each hit deals max(1, attack - defense) (Character.take_damage)
+# against a defense rolled from 0..defense, and the enemy follows
+# TacticalCombatAI._fallback_action (flee below 30% HP, otherwise a random action
+# from its list). Only "attack" does anything: the game has no branch for an
+# enemy fleeing, so a "flee" just passes the turn and the fight goes on.
+#
+#   python -m ai_systems.combat_sim --fights 100000 --levels 1-5 --enemies goblin orc
+import argparse
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from character import Player
+from file_manager import FileManager
+
+MAX_TURNS = 200  # fights still running after this many rounds count as timeouts
+FLEE_THRESHOLD = 0.3  # enemy HP ratio below which the fallback policy tries to run away (a lost turn)
+
+# Enemy stat presets; actions use the names TacticalCombatAI understands
+ENEMY_PRESETS: Dict[str, Dict] = {
+    "goblin": {"health": 30, "attack": 8, "defense": 2, "actions": ["attack", "defend", "flee"]},
+    "skeleton": {"health": 45, "attack": 10, "defense": 4, "actions": ["attack", "attack", "defend"]},
+    "orc": {"health": 70, "attack": 14, "defense": 5, "actions": ["attack", "attack", "special", "flee"]},
+    "wraith": {"health": 55, "attack": 16, "defense": 3, "actions": ["attack", "special", "flee"]},
+    "troll": {"health": 140, "attack": 18, "defense": 8, "actions": ["attack", "attack", "defend"]}
+}
+
+# Outcome codes
+ONGOING, WIN, LOSS, TIMEOUT = 0, 1, 2, 3
+
+
+def player_stats(class_name: str, level: int, file_manager: FileManager = None) -> Dict[str, int]:
+    # Build the character through the real Player level-up path so class JSON changes are picked up
+    player = Player("sim", class_name, file_manager)
+    while player.level < level:
+        player.level_up()
+    return {"health": player.max_health, "attack": player.base_attack, "defense": player.base_defense}
+
+
+def available_classes(file_manager: FileManager = None) -> List[str]:
+    file_manager = file_manager or FileManager()
+    return sorted(name.rsplit(".", 1)[0] for name in file_manager.list_files(file_manager.classes_path, ".json"))
+
+
+def _matchups(classes: List[str], levels: List[int], enemies: List[str]) -> List[Tuple[str, int, str]]:
+    return [(c, level, e) for c in classes for level in levels for e in enemies]
+
+
+def simulate(classes: List[str], levels: List[int], enemies: List[str], fights: int = 100000,
+             seed: int = 0, max_turns: int = MAX_TURNS) -> Dict[str, Dict]:
+    # Run `fights` fights split evenly over every class/level/enemy matchup, all in one batch
+    rng = np.random.default_rng(seed)
+    matchups = _matchups(classes, levels, enemies)
+    per_matchup = max(1, fights // len(matchups))
+    n = per_matchup * len(matchups)
+    group = np.repeat(np.arange(len(matchups)), per_matchup)
+
+    # One row per fight, broadcast from the per-matchup stats
+    file_manager = FileManager()
+    builds = {(c, level): player_stats(c, level, file_manager) for c in classes for level in levels}
+    players = [builds[(c, level)] for c, level, _ in matchups]
+    foes = [ENEMY_PRESETS[e] for _, _, e in matchups]
+    p_hp, p_atk, p_def = (_column(players, field, group) for field in ("health", "attack", "defense"))
+    e_hp, e_atk, e_def = (_column(foes, field, group) for field in ("health", "attack", "defense"))
+    e_max = e_hp.copy()
+
+    # Enemy action lists padded into one matrix: 1 = attack, 0 = anything harmless (flee included)
+    width = max(len(ENEMY_PRESETS[e]["actions"]) for e in enemies)
+    action_matrix = np.zeros((len(matchups), width), dtype=np.int8)
+    action_count = np.zeros(len(matchups), dtype=np.int64)
+    for i, (_, _, enemy) in enumerate(matchups):
+        actions = ENEMY_PRESETS[enemy]["actions"]
+        action_matrix[i, :len(actions)] = [int(a == "attack") for a in actions]
+        action_count[i] = len(actions)
+
+    outcome = np.zeros(n, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int64)
+    damage_taken = np.zeros(n, dtype=np.int64)
+
+    for turn in range(1, max_turns + 1):
+        active = np.flatnonzero(outcome == ONGOING)
+        if active.size == 0:
+            break
+        turns[active] = turn
+
+        # Player attacks
+        hit = np.maximum(1, p_atk[active] - rng.integers(0, e_def[active] + 1))
+        e_hp[active] -= hit
+        won = active[e_hp[active] <= 0]
+        outcome[won] = WIN
+        active = active[e_hp[active] > 0]
+
+        # Enemy turn: fallback policy; below the threshold it flees or defends, neither deals damage
+        g = group[active]
+        low = e_hp[active] < FLEE_THRESHOLD * e_max[active]
+        choice = action_matrix[g, (rng.random(active.size) * action_count[g]).astype(np.int64)]
+        choice = np.where(low, 0, choice)
+
+        attackers = active[choice == 1]
+        hit = np.maximum(1, e_atk[attackers] - rng.integers(0, p_def[attackers] + 1))
+        p_hp[attackers] -= hit
+        damage_taken[attackers] += hit
+        outcome[attackers[p_hp[attackers] <= 0]] = LOSS
+
+    outcome[outcome == ONGOING] = TIMEOUT
+    return _summarize(matchups, group, outcome, turns, damage_taken, e_max - np.maximum(e_hp, 0))
+
+
+def _column(rows: List[Dict], field: str, group: np.ndarray) -> np.ndarray:
+    return np.array([row[field] for row in rows], dtype=np.int64)[group]
+
+
+def _summarize(matchups, group, outcome, turns, damage_taken, damage_dealt) -> Dict[str, Dict]:
+    report = {}
+    order = np.argsort(group, kind="stable")
+    bounds = np.searchsorted(group[order], np.arange(len(matchups) + 1))
+    for i, (class_name, level, enemy) in enumerate(matchups):
+        idx = order[bounds[i]:bounds[i + 1]]
+        result = outcome[idx]
+        win_turns = turns[idx][result == WIN]
+        report[f"{class_name}/L{level}/{enemy}"] = {
+            "fights": int(idx.size),
+            "win_rate": round(float(np.mean(result == WIN)), 4),
+            "loss_rate": round(float(np.mean(result == LOSS)), 4),
+            "timeout_rate": round(float(np.mean(result == TIMEOUT)), 4),
+            "turns_to_kill": _distribution(win_turns),
+            "damage_taken": _distribution(damage_taken[idx]),
+            "damage_dealt": _distribution(damage_dealt[idx])
+        }
+    return report
+
+
+def _distribution(values: np.ndarray) -> Dict[str, Optional[float]]:
+    if values.size == 0:
+        return {"mean": None, "p50": None, "p95": None, "max": None}  # e.g. turns to kill with no wins
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"mean": round(float(values.mean()), 2), "p50": float(p50), "p95": float(p95),
+            "max": float(values.max())}
+
+
+def format_report(report: Dict[str, Dict]) -> str:
+    width = max(len(key) for key in report)
+    lines = [f"{'matchup'.ljust(width)}  {'win':>6} {'loss':>6} {'timeout':>7}  {'ttk p50':>7} {'ttk p95':>7}  "
+             f"{'dmg taken p50/p95':>17}"]
+    for key, row in report.items():
+        ttk, taken = row["turns_to_kill"], row["damage_taken"]
+        lines.append(f"{key.ljust(width)}  {row['win_rate']:>6.1%} {row['loss_rate']:>6.1%} "
+                     f"{row['timeout_rate']:>7.1%}  {_turns(ttk['p50']):>7} {_turns(ttk['p95']):>7}  "
+                     f"{taken['p50']:>8.0f}/{taken['p95']:<8.0f}")
+    return "\n".join(lines)
+
+
+def _turns(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:.0f}"
+
+
+def _parse_levels(spec: str) -> List[int]:
+    # "3" or "1-5" or "1,3,5"
+    levels = []
+    for part in spec.split(","):
+        if "-" in part:
+            low, high = part.split("-")
+            levels.extend(range(int(low), int(high) + 1))
+        else:
+            levels.append(int(part))
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch combat simulation for class and enemy balance")
+    parser.add_argument("--fights", type=int, default=100000, help="total fights across all matchups")
+    parser.add_argument("--classes", nargs="+", help="class names (default: every file in data/Classes)")
+    parser.add_argument("--levels", default="1-5", help="levels to test, e.g. 1-5 or 1,3,5")
+    parser.add_argument("--enemies", nargs="+", default=list(ENEMY_PRESETS), choices=list(ENEMY_PRESETS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    classes = args.classes or available_classes()
+    started = time.perf_counter()
+    report = simulate(classes, _parse_levels(args.levels), args.enemies, args.fights, args.seed, args.max_turns)
+    elapsed = time.perf_counter() - started
+
+    print(format_report(report))
+    print(f"\n{sum(r['fights'] for r in report.values())} fights in {elapsed:.2f}s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set
+
+from ai_systems.npc import NPCHandler
+from ollama_integration import NPC_MEMORY, summarize_memories
+from ollama_integration.memory import NPCMemoryStore
+from perf_metrics import PERF
+
+# Summarization budget
+SUMMARY_TRIGGER_TOKENS = 600  # history size (estimated tokens) that triggers a summary
+KEEP_RECENT_EXCHANGES = 6  # newest exchanges always stay verbatim
+
+
+def estimate_tokens(exchanges: List[Dict]) -> int:
+    # ~4 tokens per 3 words is close enough to decide when to summarize
+    words = sum(len(f"{m.get('player', '')} {m.get('npc', '')}".split()) for m in exchanges)
+    return words * 4 // 3
+
+
+class MemorySummarizer:
+    # Folds an NPC's older exchanges into NPC.summary on a background thread once a conversation
+    # has ended; the summary is saved with the NPC and the folded exchanges leave its memory shard
+    def __init__(
+            self,
+            npc_handler: NPCHandler,
+            memory: NPCMemoryStore = NPC_MEMORY,
+            trigger_tokens: int = SUMMARY_TRIGGER_TOKENS,
+            keep_recent: int = KEEP_RECENT_EXCHANGES
+    ):
+        self.npc_handler = npc_handler
+        self.memory = memory
+        self.trigger_tokens = trigger_tokens
+        self.keep_recent = keep_recent
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="npc-summary")
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"scheduled": 0, "summarized": 0, "folded": 0, "skipped": 0, "failed": 0}
+
+    def schedule(self, npc_id: str):
+        # Called after a conversation; returns at once, repeat requests for one NPC collapse
+        with self._lock:
+            if self._closed or npc_id in self._pending:
+                return
+            self._pending.add(npc_id)
+            self.stats["scheduled"] += 1
+        self._executor.submit(self._run, npc_id)
+
+    def _run(self, npc_id: str):
+        try:
+            outcome = self._summarize(npc_id)
+        except Exception as e:
+            outcome = "failed"
+            print(f"[Error] Summarizing memories of {npc_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(npc_id)
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _summarize(self, npc_id: str) -> str:
+        npc = self.npc_handler.get_npc(npc_id)
+        if npc is None or npc_id not in self.memory:
+            return "skipped"
+        history = list(self.memory[npc_id])
+        if len(history) <= self.keep_recent or estimate_tokens(history) < self.trigger_tokens:
+            return "skipped"
+
+        older = history[:-self.keep_recent]
+        with PERF.measure("npc.summarize") as counters:
+            summary = summarize_memories(npc.name, npc.summary, older)
+            counters["exchanges"] = len(older)
+        if summary is None:
+            return "failed"  # the exchanges stay put and are retried after the next conversation
+
+        # Summary on disk before the exchanges it covers are dropped, so a crash can only duplicate
+        npc.summary = summary
+        self.npc_handler.mark_dirty(npc_id)
+        self.npc_handler.save_npcs()
+        folded = self.memory.fold(npc_id, older)
+        with self._lock:
+            self.stats["folded"] += folded
+        return "summarized"
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["pending"] = len(self._pending)
+        return stats
@@ -1,7 +1,10 @@
-from ollama_integration import interactive_dialogue, generate_dialogue
+from ollama_integration import NPC_MEMORY, interactive_dialogue, generate_dialogue
 from dataclasses import dataclass
+from npc.npc_storage import NPCRepository
+from perf_metrics import PERF
 from typing import Dict, List
-import json
+import os
+import threading
 
 # Define a simple data class to represent a Non-Player Character (NPC)
 @dataclass
@@ -11,6 +14,7 @@ class NPC:
     background: str
     personality: str
     memories: List[Dict] = None
+    summary: str = ""  # rolling summary of older conversations (see ai_systems.memory_summarizer)
 
     def __post_init__(self):
         self.memories = self.memories or []
@@ -32,52 +36,97 @@ class NPC:
                 situation=f"Personality: {self.personality}. {player_input}"
             )
 
-# Class for managing multiple NPCs stored in a JSON file
+# Class for managing multiple NPCs stored in a JSON file. The file and its append log belong to an
+# NPCRepository; saves append the changed NPCs to the log instead of rewriting the whole roster.
 class NPCHandler:
     def __init__(self, file_path: str = "data/npcs/npc_storage.json"):
         self.npcs: Dict[str, NPC] = {}
         self.file_path = file_path
+        self.dirty = set()  # NPC ids whose memories changed since the last save
+        self._save_lock = threading.Lock()  # the summarizer saves from its own thread
+        self._by_name: Dict[str, str] = {}  # normalized name -> NPC id, checked on every hit
+        self.repository: NPCRepository = None
         self.load_npcs()
 
     def load_npcs(self):
-        try:
-            with open(self.file_path) as f:
-                data = json.load(f)
-                for npc_id, npc_data in data.items():
-                    self.npcs[npc_id] = NPC(
-                        id=npc_id,
-                        name=npc_data['name'],
-                        background=npc_data['background'],
-                        personality=npc_data.get('personality', 'neutral'),
-                        memories=npc_data.get('memories', [])
-                    )
-        except FileNotFoundError:
+        if not os.path.exists(self.file_path):
             print(f"NPC storage not found at {self.file_path}")
+        # Snapshot plus any records appended since it was last compacted
+        self.repository = NPCRepository(self.file_path)
+        data = self.repository.export()
+        for npc_id, npc_data in (data.items() if isinstance(data, dict) else enumerate(data)):
+            npc_id = npc_data.get('id', str(npc_id))
+            self.npcs[npc_id] = NPC(
+                id=npc_id,
+                name=npc_data['name'],
+                background=npc_data['background'],
+                personality=npc_data.get('personality', 'neutral'),
+                memories=npc_data.get('memories', []),
+                summary=npc_data.get('summary', "")
+            )
+
+    def mark_dirty(self, npc_id: str):
+        with self._save_lock:
+            self.dirty.add(npc_id)
 
-    def save_npcs(self):
+    def _record(self, npc: NPC) -> Dict:
+        if npc.id in NPC_MEMORY:
+            # Conversations append to the NPC's memory shard, not npc.memories; the snapshot keeps
+            # the latest exchanges as the seed for a missing shard
+            npc.memories = list(NPC_MEMORY[npc.id])[-10:]
         data = {
-            npc.id: {
-                "name": npc.name,
-                "background": npc.background,
-                "personality": npc.personality,
-                "memories": npc.memories[-10:]  # Keep last 10 memories
-            }
-            for npc in self.npcs.values()
+            "name": npc.name,
+            "background": npc.background,
+            "personality": npc.personality,
+            "memories": npc.memories[-10:]  # Keep last 10 memories
         }
-        with open(self.file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        if npc.summary:
+            data["summary"] = npc.summary
+        return data
+
+    def save_npcs(self, force: bool = False) -> int:
+        # Append the NPCs that changed to the repository's log (force rewrites the whole snapshot);
+        # returns how many NPCs were dirty
+        with self._save_lock:
+            if not self.dirty and not force:
+                return 0
+            changed = len(self.dirty)
+            dirty, self.dirty = self.dirty, set()
+            with PERF.measure("io.save_npcs") as counters:
+                if force:
+                    self.repository.replace_all({npc.id: self._record(npc) for npc in list(self.npcs.values())})
+                else:
+                    for npc_id in dirty:
+                        if npc_id in self.npcs:
+                            self.repository.put(npc_id, self._record(self.npcs[npc_id]))
+                counters["npcs"] = changed
+            return changed
 
     def get_npc(self, key: str):
         key_norm = key.lower().replace(" ", "_")
         #key_norm = key
         #key_norm = key.replace(" ", "_")
 
+        if key in self.npcs:
+            return self.npcs[key]
         if key_norm in self.npcs:
             return self.npcs[key_norm]
-        for npc in self.npcs.values():
-            if npc.name.lower().replace(" ", "_") == key_norm:
-            #if npc.name.replace(" ", "_") == key_norm:
-                return npc
-        return None
+        npc = self.npcs.get(self._by_name.get(key_norm))
+        if npc is None or key_norm not in (self._norm(npc.name), self._norm(npc.id)):
+            # Not indexed, or the NPC was renamed or replaced since the index was built
+            self._index_names()
+            npc = self.npcs.get(self._by_name.get(key_norm))
+        return npc
 
+    @staticmethod
+    def _norm(name: str) -> str:
+        return name.lower().replace(" ", "_")
 
+    def _index_names(self):
+        # Ids like "Guard" are matched case-insensitively too; names win over ids
+        by_name = {}
+        for npc in list(self.npcs.values()):
+            by_name.setdefault(self._norm(npc.name), npc.id)
+        for npc in list(self.npcs.values()):
+            by_name.setdefault(self._norm(npc.id), npc.id)
+        self._by_name = by_name
@@ -3,8 +3,9 @@ from typing import Dict, Optional
 import random
 
 class PuzzleGenerator:
-    def __init__(self, difficulty: str = "medium"):
+    def __init__(self, difficulty: str = "medium", model: Optional[str] = None):
         self.difficulty = difficulty  # Set puzzle difficulty
+        self.model = model  # Model used for puzzle generation; None lets the router pick
         self.puzzle_types = ["riddle", "pattern", "physical", "logic"]  # Types of puzzles
 
     def generate_puzzle(self, theme: str) -> Dict:
@@ -18,15 +19,17 @@ Format as JSON with:
 - "reward": string (item ID)"""
 
         try:
-            response = generate_structured_response(prompt, model="llama3")  # Query Ollama
+            response = generate_structured_response(prompt, model=self.model, response_format="json",
+                                                    call_site="puzzle")  # Query Ollama
             return self._validate_puzzle(response)
         except Exception as e:
             print(f"Puzzle generation failed: {e}")  # Log error if generation fails
             return self._fallback_puzzle(theme)  # Return fallback puzzle
 
-    def _validate_puzzle(self, response: str) -> Dict:
-        # Strip formatting and parse the response
-        puzzle = eval(response.strip("```json\n").strip("```"))
+    def _validate_puzzle(self, puzzle: Dict) -> Dict:
+        # Response is already parsed and schema-checked; just guard against a failed call
+        if not puzzle:
+            raise ValueError("Empty puzzle response")
         required = ["description", "solution", "hints", "reward"]
         return {k: puzzle.get(k, "Error") for k in required}  # Return validated fields
 
@@ -36,10 +36,12 @@ Required JSON format:
 }}"""
 
         try:
-            response = generate_structured_response(prompt)  # Call AI to generate quest
-            data = json.loads(response.strip("```json\n").strip("```"))  # Parse JSON
+            # Schema-constrained call returns a validated dict with exactly the Quest fields
+            data = generate_structured_response(prompt, response_format="json", call_site="quest")
+            if not data:
+                raise ValueError("Empty quest response")
             return Quest(
-                id=f"quest_{npc_id}_{hash(response)}",  # Unique ID using hash
+                id=f"quest_{npc_id}_{hash(json.dumps(data, sort_keys=True))}",  # Unique ID using hash
                 **data
             )
         except Exception as e:
@@ -46,9 +46,9 @@ class Character:
 
 # Player character class with leveling and class data
 class Player(Character):
-    def __init__(self, name, player_class):
+    def __init__(self, name, player_class, file_manager=None):
         super().__init__(name)
-        self.file_manager = FileManager()  # Load class data
+        self.file_manager = file_manager or FileManager()  # Load class data
         self.experience = 0
         self.level = 1
         self.quests = []
@@ -1,16 +1,19 @@
 from file_manager import FileManager
 from item_system import ItemSystem
-from npc.npc_handler import NPCHandler
+from room_index import RoomIndex, LazyRoomMap
 import random
-from ai_systems.npc import NPCHandler  # Possible duplicate import
+from ai_systems.npc import NPCHandler
 
 class Dungeon:
-    def __init__(self, file_manager: FileManager = None):
+    def __init__(self, file_manager: FileManager = None, npc_handler: NPCHandler = None):
         self.file_manager = file_manager or FileManager()  # Setup file manager
-        self.rooms = self.load_rooms()  # Load all saved rooms
+        self.room_index = RoomIndex(self.file_manager, self.file_manager.room_store())  # Manifest of saved rooms
+        self.rooms = self.load_rooms()  # Room bodies load on first access
         self.item_system = ItemSystem()  # Handles item retrieval
-        self.NPCHandler = NPCHandler()  # Handles NPC loading
+        # Handles NPC loading; shared with DungeonMaster when passed in
+        self.NPCHandler = npc_handler or NPCHandler(str(self.file_manager.npcs_path / "npc_storage.json"))
         self.dynamic_rooms = {}  # Holds newly generated or fallback rooms
+        self.dirty_rooms = set()  # Rooms changed since the last save
         self._ensure_entrance_exists()  # Guarantee entrance exists
 
     def _ensure_entrance_exists(self):
@@ -27,25 +30,37 @@ class Dungeon:
                 "features": ["carved runes"],
                 "npcs": []
             }
-            self.rooms["entrance"] = entrance
-            self.file_manager.write_json("entrance.json", entrance)
-
-    def load_rooms(self) -> dict:
-        # Load all rooms from file and return dictionary
-        rooms = {}
-        entrance_data = self.file_manager.read_json("entrance.json")
-        if entrance_data:
-            rooms["entrance"] = entrance_data
-
-        for room_file in self.file_manager.list_dungeon_files():
-            if room_file != "entrance.json":
-                room_data = self.file_manager.read_json(room_file)
-                if room_data:
-                    rooms[room_data['id']] = room_data
-
-        self.rooms = rooms
-        self._add_missing_reverse_exits()
-        return rooms
+            self.save_room(entrance)
+
+    def load_rooms(self) -> LazyRoomMap:
+        # Read the room manifest (rebuilt only if data/dungeons changed); bodies load lazily
+        self.room_index.load()
+        self.rooms = LazyRoomMap(self.room_index)
+        return self.rooms
+
+    def save_room(self, room_data):
+        # Persist a room and record it in the manifest
+        return self.save_rooms([room_data])
+
+    def save_rooms(self, rooms):
+        # Persist several rooms at once (a single transaction on the packed store)
+        for room_data in rooms:
+            self.rooms[room_data['id']] = room_data
+            self.dirty_rooms.discard(room_data['id'])
+        return self.room_index.persist(list(rooms))
+
+    def mark_dirty(self, room_id):
+        # Call after changing a room in place so the next save writes it
+        self.dirty_rooms.add(room_id)
+
+    def save_dirty_rooms(self):
+        # Write only the rooms changed since the last save; returns how many were written
+        rooms = [self.rooms[room_id] if room_id in self.rooms else self.dynamic_rooms[room_id]
+                 for room_id in self.dirty_rooms if room_id in self.rooms or room_id in self.dynamic_rooms]
+        if rooms and not self.save_rooms(rooms):
+            raise IOError("Room save failed")
+        self.dirty_rooms.clear()
+        return len(rooms)
 
     def validate_room(self, room_data):
         # Validate and complete a room’s required fields
@@ -92,11 +107,13 @@ class Dungeon:
                 'features': ['crumbling walls']
             }
             self.dynamic_rooms[room_id] = room
+            self.mark_dirty(room_id)
 
         # If no exits are defined, generate an unexplored one
         if not room.get('exits') and room.get('type') not in ['treasure', 'shrine']:
             direction = random.choice(['north', 'south', 'east', 'west'])
             room['exits'][direction] = f"unexplored_{direction}_{room_id}"
+            self.mark_dirty(room_id)
 
         return room
 
@@ -120,6 +137,7 @@ class Dungeon:
             'features': ['shifting walls']
         }
         self.dynamic_rooms[room_id] = fallback
+        self.mark_dirty(room_id)
         return fallback
 
     def add_dynamic_room(self, room_data):
@@ -127,6 +145,8 @@ class Dungeon:
         if not hasattr(self, 'dynamic_rooms'):
             self.dynamic_rooms = {}
         self.dynamic_rooms[room_data['id']] = room_data
+        if room_data['id'] not in self.rooms:
+            self.mark_dirty(room_data['id'])  # not persisted yet
         return room_data
 
     def connect_rooms(self, room1_id, room2_id, direction):
@@ -142,6 +162,8 @@ class Dungeon:
 
             room1['exits'][direction] = room2_id
             room2['exits'][opposite_dir] = room1_id
+            self.mark_dirty(room1_id)
+            self.mark_dirty(room2_id)
 
             return True
 
@@ -183,25 +205,3 @@ class Dungeon:
         except Exception as e:
             print(f"Error getting npc {npc_id}: {e}")
         return None
-
-    def save_dynamic_rooms(self):
-        # Save all dynamically created rooms to disk
-        for room_id, room in self.dynamic_rooms.items():
-            try:
-                self.file_manager.write_json(f'dungeons/{room_id}.json', room)
-            except Exception as e:
-                print(f"Error saving room {room_id}: {e}")
-
-    def _add_missing_reverse_exits(self):
-        # Auto-add reverse exits for existing room connections
-        protected = {"entrance", "hallway1", "chamber1"}
-        opp = {'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east', 'up': 'down', 'down': 'up'}
-        for room in self.rooms.values():
-            if room['id'] in protected:
-                continue
-            for d, target in room.get('exits', {}).items():
-                if isinstance(target, str) and target in self.rooms:
-                    rev = opp[d]
-                    tgt = self.rooms[target]
-                    if room['id'] not in protected and rev not in tgt.get('exits', {}):
-                        tgt.setdefault('exits', {})[rev] = room['id']
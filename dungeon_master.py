@@ -1,46 +1,65 @@
+import time
+_IMPORTS_STARTED = time.perf_counter()  # first line so the startup report covers module imports
+
 import pathlib
 import os
 from character import Player
-from dungeon import Dungeon
-from file_manager import FileManager
 from game_state import save_game, load_game
-from generators.smart_dungeon_gen import SmartDungeonGenerator
-from ollama_integration import interactive_dialogue, generate_dialogue
-from ai_systems.npc import NPCHandler
-from ai_systems.quests import Quest, QuestGenerator
-from ai_systems.puzzles import PuzzleGenerator
-from ai_systems.combat import TacticalCombatAI
+from services import Services, StartupReport
+from ollama_integration import interactive_dialogue, generate_dialogue, describe_warm_up
+from ollama_integration import NPC_MEMORY
+from ollama_integration import (get_cache_stats, get_breaker_stats, get_inflight_stats, get_parse_stats,
+                                get_stream_stats, get_warmup_report, get_router_stats)
+from ai_systems.quests import Quest
 from Spell_system import SpellSystem
+from perf_metrics import PERF
+from entity_resolver import confident
+import json
 import random
-import time
+
+IMPORTS_SECONDS = time.perf_counter() - _IMPORTS_STARTED
+
+# Write sites whose bytes and event counts make up the cost of one save
+SAVE_WRITE_SITES = ["io.write_json", "io.store_write", "io.save_game", "io.save_npcs"]
+
+# Command words offered by "Did you mean" suggestions
+COMMAND_WORDS = [
+    'north', 'south', 'east', 'west', 'go',
+    'take', 'drop', 'use', 'equip', 'examine', 'inventory',
+    'look', 'search', 'rest', 'stats', 'save', 'perf', 'help', 'quit'
+]
 
 class DungeonMaster:
-    def __init__(self):
+    def __init__(self, services: Services = None):
 
         self.game_root = pathlib.Path(__file__).parent
         self.dungeons_dir = self.game_root / "data" / "dungeons"
         self.npcs_dir = self.game_root / "data" / "npcs"
         self.saves_dir = self.game_root / "saves"
-        self.file_manager = FileManager(self.game_root)
-        self.dungeon = Dungeon(self.file_manager)
+        if services is None:
+            startup = StartupReport()
+            startup.add("imports", IMPORTS_SECONDS)
+            services = Services(self.game_root, startup)
+        self.services = services  # built once; everything below shares these instances
+        self.file_manager = services.file_manager
+        self.dungeon = services.dungeon
         self.player = None
-        self.dungeon = Dungeon()
         self.current_room = None
         self.game_active = False
-        self.room_generator = SmartDungeonGenerator(self.dungeon)
+        self.room_generator = services.room_generator
+        self.prefetcher = services.prefetcher
         self.discovered_rooms = set()
-        npc_file = self.file_manager.npcs_path / "npc_storage.json"
-        if not npc_file.exists():
-            npc_file.write_text("{}", encoding="utf-8")
-        self.npc_handler = NPCHandler(str(npc_file))
-        print("DEBUG npc_handler keys =", list(self.npc_handler.npcs.keys()))
-        print("DEBUG npc_file =", npc_file)
-        self.quest_system = QuestGenerator(self.npc_handler)
+        self.npc_handler = services.npc_handler
+        self.resolver = services.resolver
+        self.resolver.index_commands(COMMAND_WORDS)
+        self.quest_system = services.quest_system
         self.current_quest = None
-        self.puzzle_system = PuzzleGenerator()
-        self.combat_ai = TacticalCombatAI()
+        self._saved_fingerprint = None  # player/progress record as last written
+        self.puzzle_system = services.puzzle_system
+        self.combat_ai = services.combat_ai
+        self.summarizer = services.summarizer
         self.combat_active = False
-        
+
     def start_new_game(self):
         print("\n=== DUNGEON ADVENTURE ===")
         print("A text adventure of exploration and mystery\n")
@@ -61,7 +80,7 @@ class DungeonMaster:
         ##class array
         Classes = ["Fighter", "Wizard", "Paladin"]
 
-        self.player = Player(player_name, Classes[player_class_int-1])
+        self.player = Player(player_name, Classes[player_class_int-1], self.file_manager)
         self.current_room = self.dungeon.get_room("entrance")
         self.game_active = True
         self.discovered_rooms = {self.current_room['id']}
@@ -84,7 +103,7 @@ class DungeonMaster:
             return
 
         try:
-            self.player = Player(data['player']['name'], data['player']['class'])
+            self.player = Player(data['player']['name'], data['player']['class'], self.file_manager)
             stats = {
                 'health': (100, 200),
                 'max_health': (100, 200),
@@ -101,19 +120,13 @@ class DungeonMaster:
             self.player.inventory = [item for item in data['player'].get('inventory', [])
                                      if isinstance(item, dict) and 'id' in item]
 
-            self.dungeon = Dungeon()
-            self.room_generator = SmartDungeonGenerator(self.dungeon)
+            self.dungeon, self.room_generator, self.prefetcher = self.services.new_world()
             self.SpellSystem = SpellSystem(self.player)
 
-            if 'discovered_rooms' in data:
-                for room_id in data['discovered_rooms']:
-                    if room_id not in self.dungeon.rooms:
-                        try:
-                            room_data = self.file_manager.read_json(f"{room_id}.json")
-                            if room_data:
-                                self.dungeon.add_dynamic_room(room_data)
-                        except:
-                            pass
+            # Saved rooms load lazily from the room store (or the JSON manifest) behind dungeon.rooms
+            missing = [room_id for room_id in data.get('discovered_rooms', []) if room_id not in self.dungeon.rooms]
+            if missing:
+                print(f"Warning: {len(missing)} discovered rooms are no longer stored: {', '.join(missing)}")
 
             self.current_room = self.dungeon.get_room(data['current_room'])
             if not self.current_room:
@@ -164,7 +177,6 @@ class DungeonMaster:
                     print(f"- {item['name']}")
 
         if 'npcs' in self.current_room and self.current_room['npcs']:
-            print("DEBUG current_room['npcs'] =", self.current_room['npcs'])
             print("\nYou see:")
             for npc_id in self.current_room['npcs']:
                 npc = self.dungeon.get_npc(npc_id)
@@ -176,19 +188,25 @@ class DungeonMaster:
             exit_text = ", ".join(exits[:-1]) + f" and {exits[-1]}" if len(exits) > 1 else exits[0]
             print(f"\nExits to the {exit_text}")
 
-    def _resolve_npc(self, key: str):
-        key_norm = key.lower().replace(" ", "_")
+        # Start generating the rooms behind unexplored exits while the player reads
+        self.prefetcher.schedule(self.current_room)
 
-        for npc_id in self.current_room.get("npcs", []):
-            
-            npc_obj = self.npc_handler.get_npc(npc_id)
-            if not npc_obj:
-                continue
-            if npc_id == key_norm:
-                return npc_id
-            if npc_obj.name.lower().replace(" ", "_") == key_norm:
-                return npc_id
-        return None
+    def _resolve_npc(self, key: str):
+        npcs = {npc_id: self.npc_handler.get_npc(npc_id) for npc_id in self.current_room.get("npcs", [])}
+        npcs = {npc_id: npc for npc_id, npc in npcs.items() if npc}
+        self.resolver.index_npcs({npc_id: npc for npc_id, npc in npcs.items() if npc_id not in self.resolver.npcs})
+        return confident(self.resolver.resolve_npc(key, npcs))
+
+    def _room_items(self):
+        return [item for item in map(self.dungeon.get_item, self.current_room.get('items', [])) if item]
+
+    def _match_item(self, item_name, items):
+        # Best match for what the player typed, or a "Did you mean" hint when it's unclear
+        matches = self.resolver.resolve_item(item_name, items)
+        item = confident(matches)
+        if item or not matches:
+            return item, ""
+        return None, f" Did you mean: {', '.join(match['name'] for match, _ in matches)}?"
 
     def process_command(self, command):
         cmd = command.lower().strip()
@@ -282,6 +300,8 @@ class DungeonMaster:
             return self.quit_game()
         elif cmd == 'help':
             return self.show_help()
+        elif cmd == 'perf':
+            return self.show_perf()
 
         
         else:
@@ -302,12 +322,13 @@ class DungeonMaster:
                     print(f"\nYou carefully explore the {direction} passage...")
                     time.sleep(1)
 
-                    new_room = self.room_generator.generate_new_room(
+                    new_room = self.prefetcher.next_room(
                         self.current_room['id'],
                         direction
                     )
 
                     self.current_room['exits'][direction] = new_room['id']
+                    self.dungeon.mark_dirty(self.current_room['id'])
                     self.dungeon.add_dynamic_room(new_room)
                     next_room_id = new_room['id']
 
@@ -326,6 +347,7 @@ class DungeonMaster:
                 direction
             )
             self.current_room['exits'][direction] = new_room['id']
+            self.dungeon.mark_dirty(self.current_room['id'])
             self.dungeon.add_dynamic_room(new_room)
 
             self.current_room = new_room
@@ -346,12 +368,17 @@ class DungeonMaster:
             return f"No {npc_name} here to talk to."
 
         print(f"\n=== Conversation with {npc.name} ===")
+        # The first conversation seeds this NPC's memory shard from npc_storage.json;
+        # after that every exchange is appended to the shard as it happens
+        NPC_MEMORY.setdefault(npc.id, npc.memories)
         interactive_dialogue(
             npc_id=npc.id,
             npc_name=npc.name,
-            npc_background=f"{npc.background}. Personality: {npc.personality}"
+            npc_background=f"{npc.background}. Personality: {npc.personality}",
+            context=f"What you remember of earlier meetings: {npc.summary}" if npc.summary else ""
         )
-        self.npc_handler.save_npcs()
+        self.npc_handler.mark_dirty(npc.id)  # the next save copies the shard's latest exchanges
+        self.summarizer.schedule(npc.id)  # folds long histories into npc.summary in the background
         return ""
 
     def handle_npc_question(self, npc_name: str):
@@ -396,6 +423,7 @@ class DungeonMaster:
         if solution.lower() == puzzle['solution'].lower():
             self.player.inventory.append(puzzle['reward'])
             del self.current_room['puzzle']
+            self.dungeon.mark_dirty(self.current_room['id'])
             return (f"Correct! {puzzle['success_message']}\n"
                     f"Received: {puzzle['reward']['name']}")
         return random.choice(puzzle['failure_messages'])
@@ -432,7 +460,9 @@ class DungeonMaster:
 
         enemy_action = self.combat_ai.decide_action({
             'player_hp': self.player.health,
+            'player_max_hp': self.player.max_health,
             'enemy_hp': enemy.health,
+            'enemy_max_hp': getattr(enemy, 'max_health', enemy.health),
             'enemy_type': enemy.type,
             'available_actions': enemy.actions
         })
@@ -460,6 +490,7 @@ class DungeonMaster:
             theme = self.current_room.get('type', 'ancient')
             puzzle = self.puzzle_system.generate_puzzle(theme)
             self.current_room['puzzle'] = puzzle
+            self.dungeon.mark_dirty(self.current_room['id'])
 
     def generate_discovery_event(self, room):
         events = {
@@ -493,9 +524,11 @@ class DungeonMaster:
         if random.random() < 0.3:
             if random.random() < 0.5 and 'items' not in room:
                 room['items'] = [random.choice(['health_potion', 'torch', 'gold_coins'])]
+                self.dungeon.mark_dirty(room['id'])
                 print("\nYou spot something on the ground!")
             elif 'npcs' not in room:
                 room['npcs'] = [random.choice(['lost_adventurer', 'friendly_ghost'])]
+                self.dungeon.mark_dirty(room['id'])
                 print("\nSomeone else is here!")
 
     def show_help(self):
@@ -537,11 +570,77 @@ Quests & Puzzles:
 
 Game:
   save                  - Save progress
+  perf                  - Show latency and cache metrics
   help                  - Show this
   quit/exit             - Quit game
 
 Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
     """
+    def show_perf(self):
+        # Latency percentiles per call site plus the LLM layer counters
+        cache = get_cache_stats()
+        breaker = get_breaker_stats()
+        inflight = get_inflight_stats()
+        prefetch = self.prefetcher.get_stats()
+        lines = ["=== PERFORMANCE ===", PERF.report(), ""]
+        lines.append(f"Cache: {cache['memory_hits']} memory hits, {cache['disk_hits']} disk hits, "
+                     f"{cache['misses']} misses (hit ratio {cache['hit_ratio']})")
+        lines.append(f"Breaker: {breaker['state']}, {breaker['trips']} trips, "
+                     f"{breaker['short_circuited']} short-circuited")
+        lines.append(f"In-flight sharing: {inflight['shared']} requests piggybacked on {inflight['calls']} model calls")
+        lines.append(f"Prefetch: {prefetch['hits']} hits, {prefetch['late_hits']} late, "
+                     f"{prefetch['misses']} misses (hit rate {prefetch['hit_rate']})")
+        pipeline = self.room_generator.get_pipeline_stats()
+        if pipeline['last']:
+            last = pipeline['last']
+            lines.append(f"Room pipeline: last room {last['critical_path']}s critical path vs {last['serial']}s serial, "
+                         f"room type guessed for {pipeline['type_guess_rate']:.0%} of {pipeline['rooms']} rooms, "
+                         f"{pipeline['wasted_pieces']} pieces of wrong guesses left running")
+        memory = NPC_MEMORY.get_stats()
+        lines.append(f"NPC memory: {memory['loaded']} loaded ({memory['loaded_bytes'] // 1024} KB), "
+                     f"{memory['appends']} appends, {memory['loads']} loads, {memory['evictions']} evictions")
+        summaries = self.summarizer.get_stats()
+        lines.append(f"NPC summaries: {summaries['summarized']} written, {summaries['folded']} exchanges folded, "
+                     f"{summaries['pending']} pending")
+        policy = self.combat_ai.policy.get_stats()
+        lines.append(f"Combat policy: {policy['memo_hits']} memoized, {policy['local']} local, "
+                     f"{policy['escalations']} LLM ({policy['table_size']} states learned)")
+        router = get_router_stats()
+        lines.append(f"Model routing: {router['downgrades']} SLO downgrades, {router['restores']} restores")
+        for call_site, route in router['routes'].items():
+            if route['latency'] is not None or route['downgraded']:
+                lines.append(f"  {call_site}: {route['model']}{' (downgraded)' if route['downgraded'] else ''}, "
+                             f"avg {route['latency']}s / SLO {route['slo']}s")
+        for call_site, counts in get_parse_stats().items():
+            lines.append(f"Parse {call_site}: {counts['ok']} ok, {counts['repaired']} repaired, "
+                         f"{counts['failed']} failed")
+        streams = get_stream_stats()
+        if streams:
+            last = streams[-1]
+            lines.append(f"Last conversation ({last['npc_id']}): {last['turns']} turns, first token in "
+                         f"{last['avg_ttft']}s avg / {last['max_ttft']}s max, {last['tokens_per_sec']} tokens/s")
+        lines.append(describe_warm_up())
+        lines.append(self.services.startup.describe())
+        return "\n".join(lines)
+
+    def dump_perf(self, path="saves/perf_metrics.json"):
+        # Snapshot every metric to disk so sessions can be compared offline
+        return PERF.dump(path, extra={
+            "cache": get_cache_stats(),
+            "breaker": get_breaker_stats(),
+            "in_flight": get_inflight_stats(),
+            "prefetch": self.prefetcher.get_stats(),
+            "room_pipeline": self.room_generator.get_pipeline_stats(),
+            "npc_memory": NPC_MEMORY.get_stats(),
+            "npc_summaries": self.summarizer.get_stats(),
+            "combat_policy": self.combat_ai.policy.get_stats(),
+            "parse": get_parse_stats(),
+            "streams": get_stream_stats(),
+            "routing": get_router_stats(),
+            "warm_up": get_warmup_report(),
+            "startup_ms": self.services.startup.as_dict()
+        })
+
     def show_sheet(self):
         output = "=== CHARACTER SHEET ===\n"
         output = f"{output}\n Name: {self.player.name}"
@@ -656,8 +755,9 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
     """
 
     def examine_item(self, item_name):
-        inventory_item = next((i for i in self.player.inventory
-                                   if i['name'].lower() == item_name.lower()), None)
+        # Carried items win over room items with the same id
+        item, hint = self._match_item(item_name, self.player.inventory + self._room_items())
+        inventory_item = item if any(i is item for i in self.player.inventory) else None
         if inventory_item:
             desc = inventory_item.get('description', 'A mysterious item of unknown purpose.')
             details = ""
@@ -674,42 +774,37 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
 
             return f"=== {inventory_item['name'].upper()} ===\n{desc}{details}"
 
-        if 'items' in self.current_room:
-            for item_id in self.current_room['items']:
-                item = self.dungeon.get_item(item_id)
-                if item and item['name'].lower() == item_name.lower():
-                    return f"You examine {item['name']}:\n{item.get('description', 'It looks interesting.')}"
+        if item:
+            return f"You examine {item['name']}:\n{item.get('description', 'It looks interesting.')}"
 
-        return f"You don't see {item_name} here."
+        return f"You don't see {item_name} here.{hint}"
 
     def take_item(self, item_name):
         if 'items' not in self.current_room or not self.current_room['items']:
             return "There's nothing here to take."
 
-        for i, item_id in enumerate(self.current_room['items']):
-            item = self.dungeon.get_item(item_id)
-            if item and item['name'].lower() == item_name.lower():
-                if len(self.player.inventory) >= 10:
-                    return "Your inventory is full! Drop something first."
-
-                del self.current_room['items'][i]
-                self.player.inventory.append(item)
-
-                take_messages = [
-                    f"You pick up the {item['name']}.",
-                    f"The {item['name']} goes into your pack.",
-                    f"You take the {item['name']}.",
-                    f"Added {item['name']} to inventory."
-                ]
-                return random.choice(take_messages)
-
-        return f"You don't see {item_name} here."
+        item, hint = self._match_item(item_name, self._room_items())
+        if not item:
+            return f"You don't see {item_name} here.{hint}"
+        if len(self.player.inventory) >= 10:
+            return "Your inventory is full! Drop something first."
+
+        self.current_room['items'].remove(item['id'])
+        self.dungeon.mark_dirty(self.current_room['id'])
+        self.player.inventory.append(item)
+
+        take_messages = [
+            f"You pick up the {item['name']}.",
+            f"The {item['name']} goes into your pack.",
+            f"You take the {item['name']}.",
+            f"Added {item['name']} to inventory."
+        ]
+        return random.choice(take_messages)
 
     def drop_item(self, item_name):
-        item = next((i for i in self.player.inventory
-                        if i['name'].lower() == item_name.lower()), None)
+        item, hint = self._match_item(item_name, self.player.inventory)
         if not item:
-            return f"You're not carrying {item_name}."
+            return f"You're not carrying {item_name}.{hint}"
 
         if item == self.player.equipped.get('weapon'):
             self.player.equipped['weapon'] = None
@@ -720,14 +815,14 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
         if 'items' not in self.current_room:
             self.current_room['items'] = []
         self.current_room['items'].append(item['id'])
+        self.dungeon.mark_dirty(self.current_room['id'])
 
         return f"You drop the {item['name']}."
 
     def use_item(self, item_name):
-        item = next((i for i in self.player.inventory
-                        if i['name'].lower() == item_name.lower()), None)
+        item, hint = self._match_item(item_name, self.player.inventory)
         if not item:
-            return f"You're not carrying {item_name}."
+            return f"You're not carrying {item_name}.{hint}"
 
         if not item.get('usable', False):
             return f"You can't use the {item['name']}."
@@ -749,10 +844,9 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
         return f"You use the {item['name']}, but nothing noticeable happens."
 
     def equip_item(self, item_name):
-        item = next((i for i in self.player.inventory
-                        if i['name'].lower() == item_name.lower()), None)
+        item, hint = self._match_item(item_name, self.player.inventory)
         if not item:
-            return f"You're not carrying {item_name}."
+            return f"You're not carrying {item_name}.{hint}"
 
         if not item.get('equippable', False):
             return f"You can't equip the {item['name']}."
@@ -768,21 +862,7 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
         return f"Equipped {item['name']} as {slot}."
 
     def find_similar_commands(self, input_cmd):
-        commands = {
-            'movement': ['north', 'south', 'east', 'west', 'go'],
-            'inventory': ['take', 'drop', 'use', 'equip', 'examine', 'inventory'],
-            'game': ['look', 'search', 'rest', 'stats', 'save', 'help', 'quit']
-        }
-
-        suggestions = []
-        input_cmd = input_cmd.lower()
-
-        for category in commands.values():
-            for cmd in category:
-                if input_cmd in cmd or cmd.startswith(input_cmd):
-                    suggestions.append(cmd)
-
-        return suggestions[:3]
+        return self.resolver.suggest_commands(input_cmd.lower())
 
     def quit_game(self):
         print("\nAre you sure you want to quit? (y/n)")
@@ -791,6 +871,7 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
             if input().lower() == 'y':
                 print(self.save_game_state())
             self.game_active = False
+            self.file_manager.flush()  # make sure queued writes are on disk before we exit
             return "Goodbye! Your adventure awaits..."
         return "Resuming your adventure..."
 
@@ -811,14 +892,30 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
             'discovered_rooms': list(self.discovered_rooms)
         }
 
-        if hasattr(self.dungeon, 'dynamic_rooms'):
-            for room_id, room_data in self.dungeon.dynamic_rooms.items():
-                try:
-                    self.file_manager.write_json(f"{room_id}.json", room_data)
-                except Exception as e:
-                    print(f"Error saving dynamic room {room_id}: {e}")
-
-        if save_game(save_data):
+        # Incremental checkpoint: only rooms, NPCs and the player record that changed are written
+        before = PERF.totals(SAVE_WRITE_SITES)
+        started = time.perf_counter()
+        rooms_written = npcs_written = 0
+        try:
+            rooms_written = self.dungeon.save_dirty_rooms()
+        except Exception as e:
+            print(f"Error saving rooms: {e}")
+        try:
+            npcs_written = self.npc_handler.save_npcs()
+        except Exception as e:
+            print(f"Error saving NPCs: {e}")
+
+        fingerprint = json.dumps(save_data, sort_keys=True, default=str)
+        saved = fingerprint == self._saved_fingerprint or save_game(save_data)
+        if saved:
+            self._saved_fingerprint = fingerprint
+
+        after = PERF.totals(SAVE_WRITE_SITES)
+        PERF.record("save.checkpoint", time.perf_counter() - started,
+                    bytes=after.get("bytes", 0) - before.get("bytes", 0),
+                    writes=after["count"] - before["count"],
+                    rooms=rooms_written, npcs=npcs_written)
+        if saved:
             return "Game saved successfully!"
         return "Failed to save game."
     def cast_spell(self, spellName):
@@ -856,6 +953,8 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
             else:
                 print("Please enter 1, 2, or 3.")
 
+        print(f"\n{describe_warm_up()}")
+
         while self.game_active:
             try:
                 command = input("\nWhat would you like to do? ").strip()
@@ -875,6 +974,11 @@ Tip: Many commands can be abbreviated (n/s/e/w, inv, exa)
                 print(f"\nAn error occurred: {str(e)}")
                 print("The game will attempt to continue...")
 
+        self.prefetcher.shutdown()
+        self.summarizer.shutdown()
+        self.dump_perf()
+        self.file_manager.flush()
+
 
 if __name__ == "__main__":
     game = DungeonMaster()
@@ -0,0 +1,148 @@
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from perf_metrics import PERF
+
+MIN_SCORE = 0.35  # weaker matches are not worth suggesting
+ACCEPT_SCORE = 0.5  # a fuzzy match this good is used without asking
+CLEAR_LEAD = 0.1  # ...as long as it beats the runner-up by this much
+
+_ARTICLES = {"the", "a", "an"}
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(name: str) -> str:
+    # "The Health_Potion!" -> "health potion"; ids and display names land on the same key
+    words = _NON_WORD.sub(" ", str(name).lower()).split()
+    while len(words) > 1 and words[0] in _ARTICLES:
+        words.pop(0)
+    return " ".join(words)
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    # Normalized-alias and trigram postings over one kind of entity; keys are entity ids
+    def __init__(self, scope: str):
+        self.scope = scope
+        self._keys: Dict[str, Set[str]] = defaultdict(set)  # alias -> keys
+        self._aliases: Dict[str, Set[str]] = {}  # key -> aliases
+        self._grams: Dict[str, Set[str]] = {}  # alias -> its trigrams
+        self._postings: Dict[str, Set[str]] = defaultdict(set)  # trigram -> aliases
+
+    def add(self, key: str, *names: str):
+        aliases = {alias for alias in (normalize(name) for name in (key,) + names) if alias}
+        self._aliases.setdefault(key, set()).update(aliases)
+        for alias in aliases:
+            self._keys[alias].add(key)
+            if alias not in self._grams:
+                self._grams[alias] = trigrams(alias)
+                for gram in self._grams[alias]:
+                    self._postings[gram].add(alias)
+
+    def remove(self, key: str):
+        for alias in self._aliases.pop(key, ()):
+            self._keys[alias].discard(key)
+            if not self._keys[alias]:
+                del self._keys[alias]
+                for gram in self._grams.pop(alias):
+                    self._postings[gram].discard(alias)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._aliases
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    def resolve(self, query: str, candidates: Optional[Iterable[str]] = None,
+                limit: int = 3) -> List[Tuple[str, float]]:
+        # Ranked (key, score) matches; candidates limits the search to entities in scope (this room, the pack)
+        with PERF.measure(f"resolve.{self.scope}"):
+            q = normalize(query)
+            if not q:
+                return []
+            allowed = set(candidates) if candidates is not None else None
+            exact = [key for key in self._keys.get(q, ()) if allowed is None or key in allowed]
+            if exact:
+                return [(key, 1.0) for key in sorted(exact)][:limit]
+
+            q_grams = trigrams(q)
+            if allowed is not None:
+                # A handful of entities in scope: score their aliases directly
+                aliases = {alias for key in allowed for alias in self._aliases.get(key, ())}
+            else:
+                aliases = set().union(*(self._postings.get(gram, ()) for gram in q_grams))
+            best: Dict[str, float] = {}
+            for alias in aliases:
+                score = self._score(q, q_grams, alias)
+                if score < MIN_SCORE:
+                    continue
+                for key in self._keys[alias]:
+                    if (allowed is None or key in allowed) and score > best.get(key, 0.0):
+                        best[key] = score
+            return sorted(best.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
+    def _score(self, q: str, q_grams: Set[str], alias: str) -> float:
+        # Dice overlap of trigrams catches typos; prefixes and substrings catch partial names
+        grams = self._grams[alias]
+        score = 2 * len(q_grams & grams) / (len(q_grams) + len(grams))
+        if alias.startswith(q):
+            score = max(score, 0.9)
+        elif f" {q}" in f" {alias}":
+            score = max(score, 0.75)
+        elif q in alias:
+            score = max(score, 0.6)
+        return score
+
+
+def confident(matches: List[Tuple[Any, float]]) -> Optional[Any]:
+    # The top match if it's exact or clearly the one meant, else None
+    if not matches:
+        return None
+    key, score = matches[0]
+    if score >= 1.0:
+        return key
+    runner_up = matches[1][1] if len(matches) > 1 else 0.0
+    return key if score >= ACCEPT_SCORE and score - runner_up >= CLEAR_LEAD else None
+
+
+class EntityResolver:
+    # One place to turn what the player typed into an NPC, item or command
+    def __init__(self):
+        self.npcs = NameIndex("npc")
+        self.items = NameIndex("item")
+        self.commands = NameIndex("command")
+
+    def index_npcs(self, npcs: Dict):
+        # npc id -> NPC object (anything with a .name)
+        for npc_id, npc in npcs.items():
+            self.npcs.add(npc_id, npc.name)
+
+    def index_items(self, items: Iterable[Dict]):
+        # Only items not seen before are added, so calling this on every room or inventory change is cheap
+        for item in items:
+            if item and item.get('id') not in self.items:
+                self.items.add(item['id'], item.get('name', item['id']))
+
+    def index_commands(self, words: Iterable[str]):
+        for word in words:
+            self.commands.add(word)
+
+    def resolve_npc(self, query: str, npc_ids: Iterable[str]) -> List[Tuple[str, float]]:
+        return self.npcs.resolve(query, npc_ids)
+
+    def resolve_item(self, query: str, items: List[Dict]) -> List[Tuple[Dict, float]]:
+        # Ranked matches among the given item dicts (room contents or inventory)
+        self.index_items(items)
+        by_id = {}
+        for item in items:
+            by_id.setdefault(item['id'], item)
+        return [(by_id[key], score) for key, score in self.items.resolve(query, by_id)]
+
+    def suggest_commands(self, text: str, limit: int = 3) -> List[str]:
+        words = text.split()
+        return [key for key, _ in self.commands.resolve(words[0], limit=limit)] if words else []
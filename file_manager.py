@@ -1,7 +1,14 @@
 import json
+import os
 from pathlib import Path
 from typing import List, Dict, Optional, Union
 
+from perf_metrics import PERF
+from write_behind import WRITER
+
+# "sqlite" packs every room into data/rooms.db; "json" keeps one file per room in data/dungeons
+ROOM_STORAGE = os.environ.get("DUNGEON_ROOM_STORE", "sqlite").lower()
+
 class FileManager:
     def __init__(self, base_path: Union[str, Path] = None):
         # Determine base project root path
@@ -19,6 +26,9 @@ class FileManager:
         self.npcs_path = self.data_path / "npcs"
         self.classes_path = self.data_path / "Classes" if (self.data_path / "Classes").exists() else self.data_path / "classes"
         self.saves_path = self.base_path / "saves"
+        self.room_store_path = self.data_path / "rooms.db"
+        self.room_storage = ROOM_STORAGE
+        self._room_store = None
 
         # Ensure all necessary directories exist
         for p in (self.data_path, self.dungeons_path, self.npcs_path, self.classes_path, self.saves_path):
@@ -26,11 +36,27 @@ class FileManager:
 
     def list_files(self, directory: Path, extension: str = None) -> List[str]:
         # List files in a directory, optionally filtered by extension
-        try:
-            return [f.name for f in directory.iterdir() if f.is_file() and (not extension or f.suffix.lower() == extension.lower())]
-        except Exception as e:
-            print(f"[Error] Failed to list files in {directory}: {e}")
-            return []
+        with PERF.measure("io.list_files") as counters:
+            try:
+                return [f.name for f in directory.iterdir() if f.is_file() and (not extension or f.suffix.lower() == extension.lower())]
+            except Exception as e:
+                counters["errors"] = 1
+                print(f"[Error] Failed to list files in {directory}: {e}")
+                return []
+
+    def room_store(self) -> Optional["RoomStore"]:
+        # Shared packed room store, opened on first use; None when rooms are kept as JSON files.
+        # sqlite3 is imported here rather than at startup, so JSON storage never loads it.
+        if self.room_storage != "sqlite":
+            return None
+        if self._room_store is None:
+            from room_store import RoomStore
+            self._room_store = RoomStore(self.room_store_path)
+        return self._room_store
+
+    def flush(self, timeout: float = None) -> bool:
+        # Wait until every queued write has reached the disk
+        return WRITER.flush(timeout)
 
     def list_dungeon_files(self) -> List[str]:
         # List all .json files in the dungeons folder
@@ -46,12 +72,18 @@ class FileManager:
         else:
             raise ValueError
         path = directory / filename
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"[Error] Failed to read {path}: {e}")
-            return None
+        with PERF.measure("io.read_json") as counters:
+            try:
+                text = WRITER.pending_text(path)  # a queued write is newer than the file
+                if text is None:
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                counters["bytes"] = len(text)
+                return json.loads(text)
+            except Exception as e:
+                counters["errors"] = 1
+                print(f"[Error] Failed to read {path}: {e}")
+                return None
 
     def write_json(self, *args) -> bool:
         # Write data as JSON to a file in default or custom directory
@@ -63,10 +95,13 @@ class FileManager:
         else:
             raise ValueError
         path = directory / filename
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
-            return True
-        except Exception as e:
-            print(f"[Error] Failed to write {path}: {e}")
-            return False
\ No newline at end of file
+        with PERF.measure("io.write_json") as counters:
+            try:
+                text = json.dumps(data, indent=2)  # serialized now, written atomically in the background
+                WRITER.write_text(path, text)
+                counters["bytes"] = len(text)
+                return True
+            except Exception as e:
+                counters["errors"] = 1
+                print(f"[Error] Failed to write {path}: {e}")
+                return False
\ No newline at end of file
@@ -1,28 +1,39 @@
 import json
 import os
 
+from perf_metrics import PERF
+from write_behind import WRITER
+
 # Default file path for saving and loading game state
 DEFAULT_SAVE_PATH = 'saves/savegame.json'
 
 def save_game(game_data, filename=DEFAULT_SAVE_PATH):
     # Save the game data to a JSON file
-    try:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)  # Ensure save directory exists
-        with open(filename, 'w') as f:
-            json.dump(game_data, f, indent=2)  # Write data to file
-        return True
-    except Exception as e:
-        print(f"Error saving game: {e}")
-        return False
+    with PERF.measure("io.save_game") as counters:
+        try:
+            text = json.dumps(game_data, indent=2)
+            WRITER.write_text(filename, text)  # Atomic write on the background writer
+            counters["bytes"] = len(text)
+            return True
+        except Exception as e:
+            counters["errors"] = 1
+            print(f"Error saving game: {e}")
+            return False
 
 def load_game(filename=DEFAULT_SAVE_PATH):
     # Load game data from a JSON file
-    try:
-        if not os.path.exists(filename):
-            return None  # Return None if file doesn't exist
+    with PERF.measure("io.load_game") as counters:
+        try:
+            pending = WRITER.pending_text(filename)
+            if pending is not None:
+                return json.loads(pending)  # A save still in the queue is the latest one
+
+            if not os.path.exists(filename):
+                return None  # Return None if file doesn't exist
 
-        with open(filename, 'r') as f:
-            return json.load(f)  # Load and return JSON content
-    except Exception as e:
-        print(f"Error loading game: {e}")
-        return None
\ No newline at end of file
+            with open(filename, 'r') as f:
+                return json.load(f)  # Load and return JSON content
+        except Exception as e:
+            counters["errors"] = 1
+            print(f"Error loading game: {e}")
+            return None
\ No newline at end of file
@@ -0,0 +1,151 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from generators.smart_dungeon_gen import SmartDungeonGenerator
+from perf_metrics import PERF
+
+# Default prefetch budget
+PREFETCH_WORKERS = 2  # background generation threads
+MAX_PREFETCHED_ROOMS = 6  # rooms generating or parked at any time
+MAX_LOOKAHEAD_DEPTH = 1  # 1 = exits of the current room, 2 = also exits of those rooms, ...
+
+
+class _PrefetchJob:
+    # A room being generated (or already parked) behind one unexplored exit
+    def __init__(self, key: str, parent: Optional[str], direction: str, future: Future):
+        self.key = key  # the unexplored_<dir>_<room> exit string
+        self.parent = parent  # key of the prefetched room this exit belongs to, if any
+        self.direction = direction
+        self.future = future
+
+
+class RoomPrefetcher:
+    # Speculatively generates rooms behind unexplored exits so moving is a cache hit
+    def __init__(
+            self,
+            generator: SmartDungeonGenerator,
+            max_workers: int = PREFETCH_WORKERS,
+            max_rooms: int = MAX_PREFETCHED_ROOMS,
+            max_depth: int = MAX_LOOKAHEAD_DEPTH
+    ):
+        self.generator = generator
+        self.max_rooms = max_rooms
+        self.max_depth = max_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="room-prefetch")
+        self._jobs: Dict[str, _PrefetchJob] = {}
+        self._current_room: Optional[Dict] = None
+        self._lock = threading.RLock()
+        self._closed = False
+        self.stats = {"scheduled": 0, "hits": 0, "late_hits": 0, "misses": 0, "cancelled": 0, "failed": 0}
+
+    @staticmethod
+    def _unexplored_exits(room: Dict) -> List[tuple]:
+        return [(direction, target) for direction, target in room.get('exits', {}).items()
+                if isinstance(target, str) and target.startswith('unexplored_')]
+
+    def schedule(self, room: Dict):
+        # Prefetch everything within the lookahead of this room and cancel the rest
+        with self._lock:
+            if self._closed:
+                return
+            self._current_room = room
+
+            # Walk the lookahead tree: current room's exits, then exits of finished prefetched rooms
+            wanted: List[tuple] = []  # (key, parent key, connecting room, direction, level)
+            frontier = [(room, None, 1)]
+            while frontier:
+                source, parent, level = frontier.pop(0)
+                for direction, key in self._unexplored_exits(source):
+                    wanted.append((key, parent, source, direction, level))
+                    job = self._jobs.get(key)
+                    if job and level < self.max_depth and self._succeeded(job):
+                        frontier.append((job.future.result(), key, level + 1))
+
+            # Player left the area these jobs were speculating on
+            wanted_keys = {w[0] for w in wanted}
+            for key in [k for k in self._jobs if k not in wanted_keys]:
+                self._drop(key)
+
+            for key, parent, source, direction, level in wanted:
+                if key in self._jobs:
+                    continue
+                if len(self._jobs) >= self.max_rooms:
+                    break
+                self._submit(key, parent, source, direction, level)
+
+    def next_room(self, connecting_room_id: str, direction: str) -> Dict:
+        # Claim a prefetched room for this exit, or generate it now on a miss
+        key = f"unexplored_{direction}_{connecting_room_id}"
+        with PERF.measure("gen.next_room"):
+            return self._claim(key, connecting_room_id, direction)
+
+    def _claim(self, key: str, connecting_room_id: str, direction: str) -> Dict:
+        with self._lock:
+            job = self._jobs.pop(key, None)
+
+        room = None
+        outcomes = []  # counted under the lock once the wait for the future is over
+        if job and not job.future.cancelled():
+            late = not job.future.done()
+            try:
+                room = job.future.result()  # waits if still generating - already part way there
+            except Exception as e:
+                print(f"Prefetch failed for {key}: {e}")
+                outcomes.append("failed")
+            if room:
+                outcomes.append("late_hits" if late else "hits")
+        if not room:
+            outcomes.append("misses")
+        with self._lock:
+            for outcome in outcomes:
+                self.stats[outcome] += 1
+
+        if not room:
+            return self.generator.generate_new_room(connecting_room_id, direction)
+
+        self.generator.commit_room(room)
+        return room
+
+    def get_stats(self) -> Dict:
+        # Prefetch effectiveness counters
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = sum(1 for j in self._jobs.values() if not j.future.done())
+            stats["parked"] = sum(1 for j in self._jobs.values() if j.future.done())
+        claims = stats["hits"] + stats["late_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["late_hits"]) / claims, 3) if claims else 0.0
+        return stats
+
+    def shutdown(self):
+        # Stop accepting work and cancel anything not yet started
+        with self._lock:
+            self._closed = True
+            for key in list(self._jobs):
+                self._drop(key)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, key: str, parent: Optional[str], source: Dict, direction: str, level: int):
+        depth = self.generator.depth + level
+        future = self._executor.submit(self.generator.build_room, source, direction, depth)
+        self._jobs[key] = _PrefetchJob(key, parent, direction, future)
+        self.stats["scheduled"] += 1
+        if level < self.max_depth:
+            future.add_done_callback(self._on_done)
+
+    def _on_done(self, future: Future):
+        # A room finished: extend the lookahead from it if there is still budget
+        with self._lock:
+            if self._closed or self._current_room is None:
+                return
+            room = self._current_room
+        self.schedule(room)
+
+    def _drop(self, key: str):
+        job = self._jobs.pop(key)
+        job.future.cancel()  # no-op if already running; the result is simply discarded
+        self.stats["cancelled"] += 1
+
+    @staticmethod
+    def _succeeded(job: _PrefetchJob) -> bool:
+        return job.future.done() and not job.future.cancelled() and job.future.exception() is None
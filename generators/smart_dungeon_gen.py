@@ -1,15 +1,40 @@
 import random
 import json
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 
 from dungeon import Dungeon
 from file_manager import FileManager
-from ollama_integration import generate_structured_response, generate_room_description
+from ollama_integration import (generate_structured_response, generate_room_description, generate_room_name,
+                                generate_npc_greeting)
+from ollama_integration.schemas import choice_schema
+from perf_metrics import PERF
+
+# Room pipeline settings
+PIPELINE_WORKERS = 6  # model calls in flight for rooms being assembled, shared by all generators
+PIECE_DEADLINE = 4.0  # seconds one piece's model call may take, retries included, before its fallback
+ROOM_REPORT_HISTORY = 20  # per-room latency reports kept for the perf screen
+
+# Name, description and NPC greeting of rooms being built run here, beside the room-type choice.
+# Started on the first room, so importing the generator doesn't spawn a pool.
+_PIECES = None
+_PIECES_LOCK = threading.Lock()
+
+
+def _pieces_pool() -> ThreadPoolExecutor:
+    global _PIECES
+    with _PIECES_LOCK:
+        if _PIECES is None:
+            _PIECES = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="room-piece")
+        return _PIECES
 
 class SmartDungeonGenerator:
-    def __init__(self, dungeon: Dungeon):
+    def __init__(self, dungeon: Dungeon, file_manager: FileManager = None):
         self.dungeon = dungeon  # Reference to the main dungeon object
-        self.file_manager = FileManager()  # Used to read/write room files
+        self.file_manager = file_manager or dungeon.file_manager  # Used to read/write room files
         self.themes = [  # Predefined dungeon themes
             "ancient cursed city",
             "forgotten dwarven kingdom",
@@ -26,38 +51,88 @@ class SmartDungeonGenerator:
             'shrine': {'weight': 15, 'exits': (1, 3)},
             'cavern': {'weight': 10, 'exits': (2, 3)}
         }
+        self._type_choices: Dict[str, Counter] = {}  # previous room type -> room types chosen after it
+        self.room_reports = deque(maxlen=ROOM_REPORT_HISTORY)  # latency breakdown of the latest rooms
+        self._lock = threading.Lock()  # rooms are built on prefetch threads too
 
     def generate_new_room(self, connecting_room_id: str, direction: str) -> Dict:
-        self.depth += 1  # Increase dungeon depth
         connecting_room = self.dungeon.get_room(connecting_room_id)
+        room_data = self.build_room(connecting_room, direction, self.depth + 1)
+        self.commit_room(room_data)
+        return room_data
+
+    def build_room(self, connecting_room: Dict, direction: str, depth: int) -> Dict:
+        # Generate a room without touching generator or dungeon state (safe to run in a worker thread)
+        with PERF.measure("gen.build_room"):
+            return self._build_room(connecting_room, direction, depth)
 
+    def _build_room(self, connecting_room: Dict, direction: str, depth: int) -> Dict:
+        # The type-dependent pieces start at once for the type we expect, while the model picks the
+        # actual type; a wrong guess restarts them for that type. Critical path: the slower of the
+        # type choice and the pieces on a right guess, their sum on a wrong one. Pieces of a wrong
+        # guess that already started can't be stopped: they hold a worker until their call returns
+        # (PIECE_DEADLINE at most), which the critical path doesn't show; the report counts them.
         try:
-            room_type = self._select_room_type(connecting_room)  # Decide next room type
-            room_data = self._create_room_data(room_type, connecting_room)  # Generate base room info
+            started = time.perf_counter()
+            context_rooms = [
+                name for room_id, name in self.dungeon.rooms.names().items()
+                if room_id != connecting_room['id']
+            ][-3:]
+            with_npc = random.random() < 0.4  # Maybe add NPCs
+            guess = self._predict_room_type(connecting_room.get('type'))
+            stages: Dict[str, float] = {}
+            pieces = self._start_pieces(guess, context_rooms, with_npc, stages)
+
+            type_started = time.perf_counter()
+            room_type = self._select_room_type(connecting_room, depth)  # Decide next room type
+            type_seconds = time.perf_counter() - type_started
+            self._learn_room_type(connecting_room.get('type'), room_type)
+            wasted = 0
+            if room_type != guess:
+                wasted = sum(1 for future in pieces.values() if not future.cancel() and not future.done())
+                stages = {}
+                pieces = self._start_pieces(room_type, context_rooms, with_npc, stages)
+
+            results = {piece: future.result() for piece, future in pieces.items()}
+            room_data = self._create_room_data(room_type, depth, results['name'], results['description'])
 
             room_data['exits'] = self._generate_exits(  # Add exits to the room
                 room_data['id'],
-                connecting_room_id,
+                connecting_room['id'],
                 direction,
-                room_type
+                room_type,
+                depth
             )
 
-            self._populate_room(room_data)  # Add items, NPCs, puzzles
-            self.file_manager.write_json(f"data/dungeons/{room_data['id']}.json", room_data)
+            self._populate_room(room_data, results.get('npcs', []))  # Add items, NPCs, puzzles
+            self._report_room(room_data['id'], time.perf_counter() - started,
+                              dict(stages, room_type=type_seconds), room_type == guess, wasted)
             return room_data
 
         except Exception as e:
             print(f"Generation error: {e}")
-            return self._create_fallback_room(connecting_room_id, direction)
+            return self._create_fallback_room(connecting_room['id'], direction, depth)
 
-    def _select_room_type(self, connecting_room: Dict) -> str:
+    def commit_room(self, room_data: Dict):
+        # Player has entered the room: advance depth and persist it
+        self.depth += 1  # Increase dungeon depth
+        self.dungeon.save_room(room_data)
+
+    def _select_room_type(self, connecting_room: Dict, depth: int) -> str:
         # Ask AI to suggest a logical room type
-        prompt = f"""Given dungeon theme '{self.current_theme}' at depth {self.depth},
+        prompt = f"""Given dungeon theme '{self.current_theme}' at depth {depth},
 and previous room type '{connecting_room.get('type')}',
-select the most appropriate room type from {list(self.room_archetypes.keys())}."""
+select the most appropriate room type from {list(self.room_archetypes.keys())}.
+Respond as JSON: {{"room_type": "<one of the types>"}}"""
         try:
-            response = generate_structured_response(prompt, temperature=0.3)
-            return response.strip().lower()
+            response = generate_structured_response(
+                prompt,
+                response_format="json",
+                temperature=0.3,
+                call_site="room_type",
+                schema=choice_schema("room_type", list(self.room_archetypes))
+            )
+            return response['room_type']
         except:
             # Fall back to random weighted selection
             return random.choices(
@@ -66,44 +141,95 @@ select the most appropriate room type from {list(self.room_archetypes.keys())}."
                 k=1
             )[0]
 
-    def _create_room_data(self, room_type: str, connecting_room: Dict) -> Dict:
-        # Get context from other rooms
-        context_rooms = [
-            r['name'] for r in self.dungeon.rooms.values()
-            if r['id'] != connecting_room['id']
-        ][-3:]
+    def _predict_room_type(self, previous_type: str) -> str:
+        # Most common choice after this type so far, else the most common archetype
+        with self._lock:
+            seen = self._type_choices.get(previous_type)
+            if seen:
+                return seen.most_common(1)[0][0]
+        return max(self.room_archetypes, key=lambda t: self.room_archetypes[t]['weight'])
+
+    def _learn_room_type(self, previous_type: str, room_type: str):
+        with self._lock:
+            self._type_choices.setdefault(previous_type, Counter())[room_type] += 1
 
+    def _start_pieces(self, room_type: str, context_rooms: List[str], with_npc: bool,
+                      stages: Dict[str, float]) -> Dict:
+        # Model calls that only depend on the room type, run concurrently; stages collects their latencies
+        pool = _pieces_pool()
+        pieces = {
+            'name': pool.submit(self._timed, stages, 'name', generate_room_name, room_type, self.current_theme,
+                                PIECE_DEADLINE),
+            'description': pool.submit(self._timed, stages, 'description', generate_room_description,
+                                       room_type, context_rooms, PIECE_DEADLINE)
+        }
+        if with_npc:
+            pieces['npcs'] = pool.submit(self._timed, stages, 'npc_flavor', self._generate_npcs, room_type)
+        return pieces
+
+    @staticmethod
+    def _timed(stages: Dict[str, float], stage: str, fn, *args):
+        started = time.perf_counter()
         try:
-            room_data = generate_room_description(
-                self.current_theme,
-                room_type,
-                context_rooms
-            )
-        except:
-            room_data = self._basic_room_data(room_type)  # Use fallback if AI fails
+            return fn(*args)
+        finally:
+            stages[stage] = time.perf_counter() - started
+
+    def _report_room(self, room_id: str, critical_path: float, stages: Dict[str, float], guessed: bool,
+                     wasted: int = 0):
+        # serial is what the same calls cost back to back, as generation used to run; wasted_pieces
+        # are pieces of a wrong guess still running on the pool after the room was done
+        report = {
+            "room_id": room_id,
+            "critical_path": round(critical_path, 3),
+            "serial": round(sum(stages.values()), 3),
+            "stages": {stage: round(seconds, 3) for stage, seconds in stages.items()},
+            "type_guessed": guessed,
+            "wasted_pieces": wasted
+        }
+        with self._lock:
+            self.room_reports.append(report)
+        PERF.record("gen.critical_path", critical_path, type_guessed=int(guessed), type_missed=int(not guessed),
+                    wasted_pieces=wasted)
+
+    def get_pipeline_stats(self) -> Dict:
+        with self._lock:
+            reports = list(self.room_reports)
+        guessed = sum(1 for report in reports if report["type_guessed"])
+        return {
+            "rooms": len(reports),
+            "type_guess_rate": round(guessed / len(reports), 2) if reports else 0.0,
+            "wasted_pieces": sum(report["wasted_pieces"] for report in reports),
+            "last": reports[-1] if reports else None,
+            "reports": reports
+        }
+
+    def _create_room_data(self, room_type: str, depth: int, name: str, description: str) -> Dict:
+        room_data = self._basic_room_data(room_type)  # features and mood aren't generated
 
         # Finalize room structure
         room_data.update({
             'id': f"{room_type}_{random.randint(1000, 9999)}",
             'type': room_type,
+            'name': name,
+            'description': description,
             'theme': self.current_theme,
-            'depth': self.depth,
+            'depth': depth,
             'items': [],
-            'npcs': [],
-            'features': room_data.get('features', [])
+            'npcs': []
         })
 
         return room_data
 
     def _generate_exits(self, room_id: str, connecting_id: str,
-                        direction: str, room_type: str) -> Dict:
+                        direction: str, room_type: str, depth: int) -> Dict:
         opposites = {'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east'}
         exits = {opposites[direction]: connecting_id}  # Connect back to previous room
 
         min_exits, max_exits = self.room_archetypes[room_type]['exits']
         target_exits = random.randint(min_exits, max_exits)
 
-        if self.depth > 5:
+        if depth > 5:
             target_exits = min(target_exits + 1, 4)  # Slightly more exits for deeper rooms
 
         possible_directions = [d for d in ['north', 'south', 'east', 'west']
@@ -136,11 +262,9 @@ select the most appropriate room type from {list(self.room_archetypes.keys())}."
 
         return exits
 
-    def _populate_room(self, room_data: Dict):
+    def _populate_room(self, room_data: Dict, npcs: List[Dict]):
         room_data['items'] = self._generate_items(room_data['type'])  # Add items
-
-        if random.random() < 0.4:
-            room_data['npcs'] = self._generate_npcs(room_data['type'])  # Maybe add NPCs
+        room_data['npcs'] = npcs  # built with the room's other pieces
 
         if room_data['type'] in ['shrine', 'treasure'] and random.random() < 0.3:
             room_data['puzzle'] = self._generate_puzzle()  # Add puzzle sometimes
@@ -170,10 +294,12 @@ select the most appropriate room type from {list(self.room_archetypes.keys())}."
             'cavern': ['cave dweller', 'mineral hunter']
         }
         npc = random.choice(npc_types.get(room_type, ['mysterious figure']))
+        # The greeting is the room's NPC flavor piece: it runs beside the name and description, so it
+        # only adds to the critical path when it is the slowest piece, and it is capped like them
         return [{
             'id': f"npc_{random.randint(1000, 9999)}",
             'name': npc,
-            'dialogue': f"Ask me about the {self.current_theme}",
+            'dialogue': generate_npc_greeting(npc, self.current_theme, PIECE_DEADLINE) or f"Ask me about the {self.current_theme}",
             'attitude': random.choice(['friendly', 'neutral', 'hostile'])
         }]
 
@@ -208,7 +334,7 @@ select the most appropriate room type from {list(self.room_archetypes.keys())}."
             'mood': random.choice(['eerie', 'calm', 'tense'])
         }
 
-    def _create_fallback_room(self, connecting_id: str, direction: str) -> Dict:
+    def _create_fallback_room(self, connecting_id: str, direction: str, depth: int) -> Dict:
         # Room created if generation fails
         opposites = {'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east'}
         return {
@@ -220,5 +346,5 @@ select the most appropriate room type from {list(self.room_archetypes.keys())}."
             'items': ['torch'] if random.random() < 0.5 else [],
             'npcs': [],
             'features': ['cracked walls', 'loose stones'],
-            'depth': self.depth
+            'depth': depth
         }
\ No newline at end of file
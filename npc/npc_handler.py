@@ -1,5 +1,5 @@
 import json
-from ollama_integration.__init__ import generate_dialogue
+from ollama_integration import generate_dialogue
 
 class NPCHandler:
     def __init__(self):
@@ -1,32 +1,171 @@
 import json
+import os
+import threading
+from typing import Dict, List, Optional, Union
+
+from perf_metrics import PERF
+from write_behind import atomic_write_text
 
 # File path for storing NPC data
 NPC_STORAGE_PATH = '../data/npcs/npc_storage.json'
 
+# Appended records replayed on load before the log is folded back into the snapshot
+COMPACT_AFTER = 256
+
+
+class NPCRepository:
+    # In-memory roster indexed by id and name. The JSON file is the snapshot; each add or update is
+    # one line appended to <file>.log, and compaction rewrites the snapshot and empties the log.
+    # The snapshot keeps its on-disk shape: a list of NPCs, or a dict keyed by NPC id
+    # (the layout ai_systems.npc.NPCHandler loads and saves through this class).
+    def __init__(self, path: str = NPC_STORAGE_PATH, compact_after: int = COMPACT_AFTER):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.compact_after = compact_after
+        self.keyed = False  # True when the snapshot is a dict keyed by id
+        self._npcs: Dict[str, Dict] = {}  # key -> npc, in file order
+        self._by_name: Dict[str, str] = {}  # name -> key of the first NPC with that name
+        self._next_key = 0  # generated keys only count up, so a removed NPC's key is never reused
+        self._log_records = 0
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        with self._lock, PERF.measure("io.npc_load") as counters:
+            self._npcs.clear()
+            self._by_name.clear()
+            try:
+                with open(self.path, 'r') as file:
+                    data = json.load(file)
+            except FileNotFoundError:
+                data = []  # Start empty if the file doesn't exist
+            self.keyed = isinstance(data, dict)
+            for key, npc in (data.items() if self.keyed else enumerate(data)):
+                self._put(str(key), npc)
+            self._log_records = self._replay()
+            counters["npcs"] = len(self._npcs)
+            counters["replayed"] = self._log_records
+        if self._log_records >= self.compact_after:
+            self.compact()
+
+    def _replay(self) -> int:
+        # Apply records appended since the last compaction; a torn last line from a crash is skipped
+        records = 0
+        try:
+            with open(self.log_path, 'r') as log:
+                for line in log:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._put(record["key"], record["npc"])
+                    records += 1
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _put(self, key: str, npc: Dict):
+        old = self._npcs.get(key)
+        self._npcs[key] = npc
+        if old is not None and self._by_name.get(old.get('name')) == key:
+            # Renamed or replaced: the name may now belong to a later NPC
+            del self._by_name[old.get('name')]
+            for other_key, other in self._npcs.items():
+                if other.get('name') == old.get('name'):
+                    self._by_name[old.get('name')] = other_key
+                    break
+        self._by_name.setdefault(npc.get('name'), key)
+
+    def _new_key(self, npc: Dict) -> str:
+        if self.keyed and npc.get('id'):
+            return npc['id']
+        while True:
+            key = f"npc_{self._next_key}" if self.keyed else str(self._next_key)
+            self._next_key += 1
+            if key not in self._npcs:
+                return key
+
+    def add(self, npc: Dict) -> str:
+        # One appended line regardless of roster size; returns the NPC's key
+        with self._lock:
+            key = self._new_key(npc)
+            self.put(key, npc)
+        return key
+
+    def put(self, key: str, npc: Dict):
+        # Add or replace the NPC stored under key with one appended log record
+        with self._lock:
+            self._put(key, npc)
+            with PERF.measure("io.npc_append") as counters:
+                line = json.dumps({"key": key, "npc": npc}) + "\n"
+                with open(self.log_path, 'a') as log:
+                    log.write(line)
+                counters["bytes"] = len(line)
+            self._log_records += 1
+            if self._log_records >= self.compact_after:
+                self.compact()
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._npcs.get(key)
+
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        key = self._by_name.get(name)
+        return self._npcs.get(key) if key is not None else None
+
+    def export(self) -> Union[List[Dict], Dict[str, Dict]]:
+        # The roster in the snapshot's own shape
+        with self._lock:
+            return dict(self._npcs) if self.keyed else list(self._npcs.values())
+
+    def replace_all(self, npcs: Union[List[Dict], Dict[str, Dict]]):
+        # Swap in a whole roster (the old save_npcs contract) and write it as the new snapshot
+        with self._lock:
+            self._npcs.clear()
+            self._by_name.clear()
+            self.keyed = isinstance(npcs, dict)
+            for key, npc in (npcs.items() if self.keyed else enumerate(npcs)):
+                self._put(str(key), npc)
+            self.compact()
+
+    def compact(self):
+        # Rewrite the snapshot atomically, then drop the log it now contains
+        with self._lock, PERF.measure("io.npc_compact") as counters:
+            text = json.dumps(self.export(), indent=4)
+            atomic_write_text(self.path, text)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self._log_records = 0
+            counters["bytes"] = len(text)
+
+    def __len__(self) -> int:
+        return len(self._npcs)
+
+
+_REPOSITORY: Optional[NPCRepository] = None
+_REPOSITORY_LOCK = threading.Lock()
+
+
+def get_repository() -> NPCRepository:
+    # Shared repository for NPC_STORAGE_PATH, reopened if the path is changed
+    global _REPOSITORY
+    with _REPOSITORY_LOCK:
+        if _REPOSITORY is None or _REPOSITORY.path != NPC_STORAGE_PATH:
+            _REPOSITORY = NPCRepository(NPC_STORAGE_PATH)
+        return _REPOSITORY
+
+
 def load_npcs():
-    # Load all NPCs from the JSON file
-    try:
-        with open(NPC_STORAGE_PATH, 'r') as file:
-            npcs = json.load(file)
-    except FileNotFoundError:
-        npcs = []  # Return empty list if file doesn't exist
-    return npcs
+    # Load all NPCs (list, or dict keyed by id, as stored in the file)
+    return get_repository().export()
 
 def save_npcs(npcs):
     # Save the NPC list to the JSON file
-    with open(NPC_STORAGE_PATH, 'w') as file:
-        json.dump(npcs, file, indent=4)
+    get_repository().replace_all(npcs)
 
 def add_npc(npc):
-    # Add a new NPC and save the updated list
-    npcs = load_npcs()
-    npcs.append(npc)
-    save_npcs(npcs)
+    # Add a new NPC with a single appended log record
+    get_repository().add(npc)
 
 def get_npc_by_name(npc_name):
-    # Find an NPC by name from the stored list
-    npcs = load_npcs()
-    for npc in npcs:
-        if npc['name'] == npc_name:
-            return npc
-    return None  # Return None if not found
\ No newline at end of file
+    # Find an NPC by name through the name index
+    return get_repository().get_by_name(npc_name)
@@ -1,14 +1,27 @@
-import ollama
-from typing import Optional, Dict, List, Union
+from collections import deque
+from typing import Deque, Optional, Dict, List, Union
 import time
 import random
 import json
+import re
+import threading
+
+from .cache import ResponseCache
+from .singleflight import SingleFlight
+from .breaker import CircuitBreaker, backoff_delay
+from .backends import LLMBackend, create_backend, is_model_missing
+from .memory import NPCMemoryStore
+from .router import DEFAULT_TIER_MODELS, ModelRouter
+from .schemas import SCHEMAS, PARSE_STATS, parse_structured
+from perf_metrics import PERF
 
 # Default model and retry settings
-OLLAMA_MODEL = "llama3.2"
+OLLAMA_MODEL = DEFAULT_TIER_MODELS["large"]  # the large tier; calls without a model are routed by ROUTER
 MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds between retries
-MAX_MEMORY_EXCHANGES = 5  # max NPC memory
+DEFAULT_DEADLINE = 15.0  # seconds one call may spend on attempts and backoff in total
+MAX_CONCURRENT_REQUESTS = 4  # in-flight async model calls per event loop
+MAX_MEMORY_EXCHANGES = 3  # NPC memory exchanges in each dialogue prompt (recent + recalled)
+MAX_DIALOGUE_SENTENCES = 2  # streamed replies stop after this many sentences
 
 # Default fallback responses if generation fails
 FALLBACK_RESPONSES = {
@@ -34,62 +47,377 @@ FALLBACK_RESPONSES = {
     ]
 }
 
-# Memory tracking for NPCs and rooms
-NPC_MEMORY: Dict[str, List[Dict]] = {}
+# Memory tracking for NPCs and rooms; NPC memories persist per NPC under data/npcs/memory
+NPC_MEMORY = NPCMemoryStore()
 ROOM_MEMORY: Dict[str, List[str]] = {}
 
+# Time-to-first-token and throughput for the latest streamed conversations
+STREAM_HISTORY = 100  # conversations kept for the perf screen
+STREAM_STATS: Deque[Dict] = deque(maxlen=STREAM_HISTORY)
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)')
+
+# Shared response cache and per-call-site opt-in/opt-out (unlisted sites are cached)
+RESPONSE_CACHE = ResponseCache()
+CACHE_POLICY: Dict[str, bool] = {
+    "dialogue": False,  # conversations should stay varied
+    "npc_summary": False,  # every summary folds in a different history
+    "combat_action": True,
+    "tactical_combat": True,
+    "room_type": True,
+    "room_name": False,  # same type and theme would give every such room the same name for a week
+    "room_description": False,
+    "room_content": True,
+    "npc_flavor": False,
+    "puzzle": True,
+    "quest": True
+}
+
+# Model backend used by every call (Ollama by default; see backends.create_backend)
+BACKEND: LLMBackend = create_backend()
+
+def set_backend(backend: LLMBackend) -> LLMBackend:
+    # Swap the model backend, e.g. for a FakeBackend when benchmarking without a model
+    global BACKEND
+    previous, BACKEND = BACKEND, backend
+    return previous
+
+# Outcome of the background model warm-up, per model
+WARMUP_REPORT: Dict[str, Dict] = {}
+_WARMUP_THREAD: Optional[threading.Thread] = None
+
+def start_warm_up(models: List[str]) -> threading.Thread:
+    # Preload models on a background thread so startup never waits on model loading
+    global _WARMUP_THREAD
+    models = list(dict.fromkeys(models))  # de-duplicate, keep order
+    for model in models:
+        WARMUP_REPORT[model] = {"status": "loading"}
+
+    def warm():
+        for model in models:
+            started = time.perf_counter()
+            try:
+                BACKEND.warm_up(model)
+                WARMUP_REPORT[model] = {"status": "ready", "seconds": round(time.perf_counter() - started, 2)}
+            except Exception as e:
+                if is_model_missing(e):
+                    ROUTER.mark_missing(model)
+                WARMUP_REPORT[model] = {"status": "failed", "error": str(e),
+                                        "seconds": round(time.perf_counter() - started, 2)}
+
+    _WARMUP_THREAD = threading.Thread(target=warm, name="model-warm-up", daemon=True)
+    _WARMUP_THREAD.start()
+    return _WARMUP_THREAD
+
+def get_warmup_report() -> Dict[str, Dict]:
+    return {model: dict(result) for model, result in WARMUP_REPORT.items()}
+
+def describe_warm_up() -> str:
+    # One line per model for the player-facing startup report
+    if not WARMUP_REPORT:
+        return "Model warm-up: not started"
+    lines = ["Model warm-up:"]
+    for model, result in get_warmup_report().items():
+        if result["status"] == "ready":
+            lines.append(f"  {model}: ready ({result['seconds']}s)")
+        elif result["status"] == "failed":
+            lines.append(f"  {model}: failed ({result['error']}) - using fallbacks until it responds")
+        else:
+            lines.append(f"  {model}: still loading in the background")
+    return "\n".join(lines)
+
+# Shared breaker: while the model host is down, calls fail fast to the fallbacks
+BREAKER = CircuitBreaker()
+
+# Identical requests already on their way to the model are shared, not repeated
+IN_FLIGHT = SingleFlight()
+
+# Picks each call site's model tier and downgrades sites whose model keeps missing its latency SLO
+ROUTER = ModelRouter()
+
+def get_cache_stats() -> Dict:
+    # Hit/miss counters for the response cache
+    return RESPONSE_CACHE.get_stats()
+
+def get_breaker_stats() -> Dict:
+    # Breaker state, trip count and how many calls were short-circuited
+    return BREAKER.get_stats()
+
+def get_inflight_stats() -> Dict:
+    # How many model calls were saved by coalescing concurrent identical requests
+    return IN_FLIGHT.get_stats()
+
+def get_parse_stats() -> Dict[str, Dict]:
+    # Structured-output parse outcomes and failure rate per call site
+    return PARSE_STATS.get_stats()
+
+def get_stream_stats() -> List[Dict]:
+    # Streaming latency reports of the latest conversations, oldest first
+    return list(STREAM_STATS)
+
+def get_router_stats() -> Dict:
+    # Model and smoothed latency per call site, plus every SLO downgrade so far
+    return ROUTER.get_stats()
+
 def generate_structured_response(
         prompt: str,
-        model: str = OLLAMA_MODEL,
+        model: Optional[str] = None,
         response_format: str = "text",
         temperature: float = 0.7,
-        max_length: int = 150
+        max_length: int = 150,
+        call_site: str = "default",
+        use_cache: Optional[bool] = None,
+        deadline: float = DEFAULT_DEADLINE,
+        schema: Optional[Dict] = None
 ) -> Union[str, Dict, None]:
-    # Query Ollama model with retries
+    # Serve identical requests from the cache unless the call site opts out
+    model = model or ROUTER.model_for(call_site)
+    if use_cache is None:
+        use_cache = CACHE_POLICY.get(call_site, True)
+    schema = _schema_for(response_format, call_site, schema)
+    cache_key = _cache_key(model, prompt, temperature, response_format, max_length, schema)
+    with PERF.measure(f"llm.{call_site}") as counters:
+        if use_cache:
+            cached = RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                counters["cache_hits"] = 1
+                return cached
+
+        result = IN_FLIGHT.do(cache_key, _query_model, prompt, model, response_format, temperature, max_length,
+                              deadline=deadline, call_site=call_site, schema=schema)
+        if result is None:
+            counters["fallbacks"] = 1
+        elif use_cache:
+            RESPONSE_CACHE.put(cache_key, result)
+        return result
+
+def _query_model(
+        prompt: str,
+        model: str,
+        response_format: str,
+        temperature: float,
+        max_length: int,
+        deadline: float = DEFAULT_DEADLINE,
+        call_site: str = "default",
+        schema: Optional[Dict] = None
+) -> Union[str, Dict, None]:
+    # Query the model backend with jittered retries inside the call's deadline budget
+    expires = time.monotonic() + deadline
     for attempt in range(MAX_RETRIES):
+        if not BREAKER.allow():
+            PERF.incr(f"llm.{call_site}", "short_circuited")
+            return None  # host is down: callers use their fallbacks immediately
+
         try:
-            response = ollama.chat(
-                model=model,
-                messages=[{
-                    'role': 'user',
-                    'content': prompt,
-                    'options': {
-                        'temperature': temperature,
-                        'num_ctx': max_length
-                    }
-                }]
+            started = time.perf_counter()
+            model, response = _routed_chat(
+                call_site,
+                model,
+                messages=[{'role': 'user', 'content': prompt}],
+                options={'temperature': temperature, 'num_predict': max_length},
+                format=_format_for(response_format, schema),
+                timeout=expires - time.monotonic()  # one attempt never outlives the call's deadline
             )
-            content = response['message']['content'].strip()
-
-            # Parse as JSON if requested
-            if response_format == "json":
-                if content.startswith('```json'):
-                    content = content[7:-3].strip()
-                return json.loads(content)
-            return content
-
         except Exception as e:
+            if not is_model_missing(e):
+                BREAKER.record_failure()
             print(f"Attempt {attempt + 1} failed: {str(e)}")
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY * (attempt + 1))
+        else:
+            BREAKER.record_success()
+            ROUTER.observe(call_site, model, time.perf_counter() - started)
+            _record_tokens(call_site, prompt, response)
+            try:
+                return _parse_content(response['message']['content'], response_format, call_site, schema)
+            except Exception as e:
+                print(f"Attempt {attempt + 1} returned unusable output: {str(e)}")
+
+        delay = backoff_delay(attempt)
+        if attempt == MAX_RETRIES - 1 or time.monotonic() + delay >= expires:
+            break
+        PERF.incr(f"llm.{call_site}", "retries")
+        time.sleep(delay)
 
     print("Max retries reached for Ollama query")
     return None
 
+def _routed_chat(call_site: str, model: str, **kwargs):
+    # (model used, response). A model the host doesn't have is rerouted at once instead of retried
+    # and never counts against the breaker shared by every call site
+    while True:
+        try:
+            return model, BACKEND.chat(model=model, call_site=call_site, **kwargs)
+        except Exception as e:
+            if not is_model_missing(e):
+                raise
+            ROUTER.mark_missing(model)
+            fallback = ROUTER.model_for(call_site)
+            if fallback == model:
+                raise
+            model = fallback
+
+async def _arouted_chat(call_site: str, model: str, **kwargs):
+    while True:
+        try:
+            return model, await BACKEND.achat(model=model, call_site=call_site, **kwargs)
+        except Exception as e:
+            if not is_model_missing(e):
+                raise
+            ROUTER.mark_missing(model)
+            fallback = ROUTER.model_for(call_site)
+            if fallback == model:
+                raise
+            model = fallback
+
+def _record_tokens(call_site: str, prompt: str, response) -> None:
+    # Prefer the server's token counts; estimate from word counts when it doesn't report them
+    content = response['message']['content'] or ""
+    PERF.incr(f"llm.{call_site}", "prompt_tokens", response.get('prompt_eval_count') or len(prompt.split()))
+    PERF.incr(f"llm.{call_site}", "response_tokens", response.get('eval_count') or len(content.split()))
+
+def _parse_content(content: str, response_format: str, call_site: str = "default",
+                   schema: Optional[Dict] = None) -> Union[str, Dict]:
+    # Parse (and repair/validate) as JSON if requested
+    if response_format == "json":
+        return parse_structured(content, schema, call_site)
+    return content.strip()
+
+def _schema_for(response_format: str, call_site: str, schema: Optional[Dict]) -> Optional[Dict]:
+    # JSON calls are constrained by the call site's schema unless one is given
+    if response_format != "json":
+        return None
+    return schema or SCHEMAS.get(call_site)
+
+def _format_for(response_format: str, schema: Optional[Dict]):
+    # Value for Ollama's `format`: a JSON schema, plain "json", or nothing for text
+    if response_format != "json":
+        return None
+    return schema or "json"
+
+def _cache_key(model: str, prompt: str, temperature: float, response_format: str,
+               max_length: int, schema: Optional[Dict]) -> str:
+    if schema:
+        response_format = f"{response_format}:{json.dumps(schema, sort_keys=True)}"
+    return RESPONSE_CACHE.make_key(model, prompt, temperature, response_format, max_length)
+
 def generate_dialogue(
         npc_name: str,
         npc_background: str,
         player_input: str,
         context: str = "",
-        memory: List[Dict] = None
+        memory: List[Dict] = None,
+        stream: bool = False,
+        turn_stats: List[Dict] = None
 ) -> str:
     # Generate dialogue using context and memory
-    memory_context = "\n".join(
-        f"Player: {m['player']}\n{npc_name}: {m['npc']}"
-        for m in (memory or [])[-3:]
-    )
+    prompt = _dialogue_prompt(npc_name, npc_background, player_input, context, memory)
+    if stream:
+        return _stream_dialogue([{'role': 'user', 'content': prompt}], turn_stats)
+    response = generate_structured_response(prompt, temperature=0.8, call_site="dialogue")
+    return _finish_dialogue(response)
+
+class DialogueSession:
+    # One conversation as an append-only chat. The roleplay instructions are a fixed system message
+    # and each turn adds only the player's line (with any recalled memories) and the reply, so
+    # everything sent before is an unchanged prefix the server can reuse from its KV cache instead
+    # of evaluating again; per-turn prompt cost stays flat as the conversation grows. The model is
+    # routed once per session: switching mid-conversation would throw that prefix away.
+    def __init__(self, npc_name: str, npc_background: str, context: str = "", model: Optional[str] = None):
+        self.npc_name = npc_name
+        self.model = model or ROUTER.model_for("dialogue")
+        self.messages: List[Dict] = [
+            {'role': 'system', 'content': _dialogue_instructions(npc_name, npc_background, context)}
+        ]
+
+    def turn(self, player_input: str, memory: List[Dict] = None, turn_stats: List[Dict] = None) -> str:
+        # Memories go in this turn's message, after the reusable prefix, never back into earlier ones
+        line = f'Player says: "{player_input}"'
+        if memory:
+            line = f"Earlier conversations you recall:\n{_memory_block(self.npc_name, memory)}\n\n{line}"
+        self.messages.append({'role': 'user', 'content': line})
+        response = _stream_dialogue(self.messages, turn_stats, self.model)
+        self.messages.append({'role': 'assistant', 'content': response})
+        return response
 
-    prompt = f"""Roleplay as {npc_name}, a {npc_background} in a fantasy RPG.
+def _stream_dialogue(messages: List[Dict], turn_stats: List[Dict] = None, model: Optional[str] = None) -> str:
+    # Print the reply token by token and hang up once the first line or sentence limit is reached
+    model = model or ROUTER.model_for("dialogue")
+    started = time.perf_counter()
+    first_token_at = None
+    tokens = 0
+    text = ""
+    printed = ""
+    stream = None
+    connected = False
+    if not BREAKER.allow():
+        PERF.incr("llm.dialogue_stream", "short_circuited")
+        response = _finish_dialogue(None)
+        print(response)
+        return response
+    try:
+        stream = BACKEND.chat(
+            model=model,
+            messages=messages,
+            options={'temperature': 0.8},
+            stream=True,
+            call_site="dialogue"
+        )
+        for chunk in stream:
+            if not connected:
+                BREAKER.record_success()
+                connected = True
+            piece = chunk['message']['content'].replace('"', '')
+            if not piece:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                ROUTER.observe("dialogue", model, first_token_at - started)  # the dialogue SLO is on TTFT
+            tokens += 1
+            text += piece
+
+            done = False
+            body = text.lstrip()
+            if '\n' in body:
+                text, done = body.split('\n')[0], True
+            else:
+                ends = list(SENTENCE_END.finditer(body))
+                if len(ends) >= MAX_DIALOGUE_SENTENCES:
+                    text, done = body[:ends[MAX_DIALOGUE_SENTENCES - 1].end()], True
+
+            visible = text.lstrip()
+            print(visible[len(printed):], end="", flush=True)
+            printed = visible
+            if done or chunk.get('done'):
+                break
+    except Exception as e:
+        if is_model_missing(e):
+            ROUTER.mark_missing(model)  # later conversations are routed to a model that exists
+        elif not connected:
+            BREAKER.record_failure()
+        print(f"Streaming failed: {str(e)}")
+    finally:
+        if hasattr(stream, 'close'):
+            stream.close()  # dropping the connection stops generation server-side
+
+    response = printed.strip()
+    if not response:
+        response = _finish_dialogue(None)
+        print(response, end="")
+    print()
+
+    # new_prompt_tokens is what a server reusing the previous turn's prefix still has to evaluate
+    PERF.record("llm.dialogue_stream", time.perf_counter() - started, response_tokens=tokens,
+                prompt_tokens=sum(len(m['content'].split()) for m in messages),
+                new_prompt_tokens=len(messages[-1]['content'].split()), fallbacks=int(first_token_at is None))
+    if turn_stats is not None and first_token_at is not None:
+        elapsed = time.perf_counter() - first_token_at
+        turn_stats.append({
+            "ttft": first_token_at - started,
+            "tokens": tokens,
+            "tokens_per_sec": tokens / elapsed if elapsed > 0 else 0.0
+        })
+    return response
+
+def _dialogue_instructions(npc_name: str, npc_background: str, context: str = "") -> str:
+    return f"""Roleplay as {npc_name}, a {npc_background} in a fantasy RPG.
 
 Character Guidelines:
 - Stay completely in character
@@ -98,15 +426,50 @@ Character Guidelines:
 - Never break the fourth wall
 
 Current Situation:
-{context}
+{context}"""
+
+def _memory_block(npc_name: str, memory: List[Dict]) -> str:
+    return "\n".join(
+        f"Player: {m['player']}\n{npc_name}: {m['npc']}"
+        for m in (memory or [])[-MAX_MEMORY_EXCHANGES:]
+    )
+
+def _dialogue_prompt(
+        npc_name: str,
+        npc_background: str,
+        player_input: str,
+        context: str = "",
+        memory: List[Dict] = None
+) -> str:
+    return f"""{_dialogue_instructions(npc_name, npc_background, context)}
 
 Previous Conversation:
-{memory_context if memory else "No prior interaction"}
+{_memory_block(npc_name, memory) if memory else "No prior interaction"}
 
 Player says: "{player_input}"
 {npc_name}:"""
 
-    response = generate_structured_response(prompt, temperature=0.8)
+def summarize_memories(npc_name: str, previous_summary: str, exchanges: List[Dict]) -> Optional[str]:
+    # Fold older exchanges into the NPC's rolling summary; None if the model gave nothing usable
+    transcript = "\n".join(f"Player: {m['player']}\n{npc_name}: {m['npc']}" for m in exchanges)
+    prompt = f"""Update the memory summary for {npc_name}, an NPC in a fantasy RPG.
+
+Current summary:
+{previous_summary or "Nothing yet"}
+
+Conversation to fold in:
+{transcript}
+
+Write the new summary in at most 4 sentences, in {npc_name}'s own perspective. Keep names, promises,
+quests, items and anything the player revealed about themselves. Drop small talk."""
+
+    response = generate_structured_response(prompt, temperature=0.3, max_length=200, call_site="npc_summary")
+    if isinstance(response, str) and response.strip():
+        return response.strip()
+    return None
+
+def _finish_dialogue(response: Optional[str]) -> str:
+    # Keep only the first line of the reply
     if response:
         response = response.split('\n')[0].replace('"', '')
         return response
@@ -120,7 +483,18 @@ def generate_room_content(
         existing_descriptions: List[str] = None
 ) -> Dict:
     # Generate room description content in structured JSON format
-    prompt = f"""Generate descriptive content for a {room_type} in a {theme} dungeon.
+    prompt = _room_content_prompt(room_type, theme, connected_rooms, existing_descriptions)
+    content = generate_structured_response(prompt, response_format="json", temperature=0.6,
+                                           call_site="room_content")
+    return _finish_room_content(content, room_type, theme)
+
+def _room_content_prompt(
+        room_type: str,
+        theme: str,
+        connected_rooms: List[str],
+        existing_descriptions: List[str] = None
+) -> str:
+    return f"""Generate descriptive content for a {room_type} in a {theme} dungeon.
 
 Connected Rooms: {', '.join(connected_rooms[:3]) if connected_rooms else "None"}
 Existing Descriptions: {existing_descriptions or "None"}
@@ -134,8 +508,9 @@ Required JSON format:
     "lore": "optional lore fragment"
 }}"""
 
+def _finish_room_content(content, room_type: str, theme: str) -> Dict:
+    # Fill in missing fields, or fall back if generation failed
     try:
-        content = generate_structured_response(prompt, response_format="json", temperature=0.6)
         if not content:
             raise ValueError("Empty response")
 
@@ -160,19 +535,16 @@ def interactive_dialogue(
         context: str = ""
 ) -> None:
     # Handle interactive dialogue with memory and exit option
-    if npc_id not in NPC_MEMORY:
-        NPC_MEMORY[npc_id] = []
+    history = NPC_MEMORY.setdefault(npc_id, [])
+    session = DialogueSession(npc_name, npc_background, context)
+    said: List[Dict] = []  # this conversation's exchanges are already in the session's messages
+    turn_stats: List[Dict] = []
 
-    memory = NPC_MEMORY[npc_id][-MAX_MEMORY_EXCHANGES:]
+    def recall(query: str) -> List[Dict]:
+        return [m for m in history.recall(query, MAX_MEMORY_EXCHANGES) if m not in said]
 
-    greeting = generate_dialogue(
-        npc_name,
-        npc_background,
-        "",
-        context,
-        memory
-    )
-    print(f"\n[{npc_name}]: {greeting or 'Greetings, traveler.'}")
+    print(f"\n[{npc_name}]: ", end="", flush=True)
+    session.turn("", recall(""), turn_stats)
 
     while True:
         try:
@@ -181,31 +553,37 @@ def interactive_dialogue(
                 continue
 
             if any(word in player_input.lower() for word in ["bye", "goodbye", "leave"]):
-                farewell = generate_dialogue(
-                    npc_name,
-                    npc_background,
-                    "goodbye",
-                    context,
-                    memory
-                )
-                print(f"\n[{npc_name}]: {farewell or 'Farewell.'}")
-                NPC_MEMORY[npc_id].append({"player": player_input, "npc": "END_CONVERSATION"})
+                print(f"\n[{npc_name}]: ", end="", flush=True)
+                session.turn("goodbye", turn_stats=turn_stats)
+                history.append({"player": player_input, "npc": "END_CONVERSATION"})
                 break
 
-            response = generate_dialogue(
-                npc_name,
-                npc_background,
-                player_input,
-                context,
-                memory
-            )
-            print(f"\n[{npc_name}]: {response}")
-            NPC_MEMORY[npc_id].append({"player": player_input, "npc": response})
+            # Same number of exchanges every turn, but the ones most relevant to what was just said
+            memory = recall(player_input)
+            print(f"\n[{npc_name}]: ", end="", flush=True)
+            response = session.turn(player_input, memory, turn_stats)
+            exchange = {"player": player_input, "npc": response}
+            history.append(exchange)
+            said.append(exchange)
 
         except KeyboardInterrupt:
             print(f"\n[{npc_name}]: *looks confused*")
             break
 
+    _record_stream_stats(npc_id, turn_stats)
+
+def _record_stream_stats(npc_id: str, turn_stats: List[Dict]):
+    # Summarise one conversation's streaming latency
+    if not turn_stats:
+        return
+    STREAM_STATS.append({
+        "npc_id": npc_id,
+        "turns": len(turn_stats),
+        "avg_ttft": round(sum(t["ttft"] for t in turn_stats) / len(turn_stats), 3),
+        "max_ttft": round(max(t["ttft"] for t in turn_stats), 3),
+        "tokens_per_sec": round(sum(t["tokens_per_sec"] for t in turn_stats) / len(turn_stats), 1)
+    })
+
 def generate_combat_action(
         enemy_type: str,
         combat_state: Dict,
@@ -222,7 +600,7 @@ Combat State:
 Personality: {personality}
 Respond ONLY with the action choice."""
 
-    response = generate_structured_response(prompt, temperature=0.3)
+    response = generate_structured_response(prompt, temperature=0.3, call_site="combat_action")
     if response and response.lower() in combat_state.get('actions', []):
         return response.lower()
 
@@ -246,7 +624,8 @@ Format as JSON with:
 - "reward": "item_id" """
 
     try:
-        puzzle = generate_structured_response(prompt, response_format="json", temperature=0.5)
+        puzzle = generate_structured_response(prompt, response_format="json", temperature=0.5,
+                                              call_site="puzzle")
         if not puzzle:
             raise ValueError("Empty puzzle response")
 
@@ -272,11 +651,12 @@ def generate_quest(
 Format as JSON with:
 - "title": "Quest name",
 - "description": "2-3 sentence hook",
-- "objectives": ["task", "list"],
+- "objectives": [{{"description": "task", "completed": false}}],
 - "reward": {{"item": "id", "xp": number}} """
 
     try:
-        quest = generate_structured_response(prompt, response_format="json", temperature=0.6)
+        quest = generate_structured_response(prompt, response_format="json", temperature=0.6,
+                                             call_site="quest")
         if not quest:
             raise ValueError("Empty quest response")
 
@@ -289,13 +669,18 @@ Format as JSON with:
         return {
             "title": f"{npc_name}'s Request",
             "description": "An important task needs completing.",
-            "objectives": ["Find the lost artifact"],
+            "objectives": [{"description": "Find the lost artifact", "completed": False}],
             "reward": {"item": "small_pouch", "xp": 100}
         }
 
-def generate_room_description(room_type: str, existing_rooms: List[str]) -> str:
+def generate_room_description(room_type: str, existing_rooms: List[str], deadline: float = DEFAULT_DEADLINE) -> str:
     # Generate short, vivid room description
-    prompt = f"""Generate a vivid 1-2 sentence description for a {room_type} in a fantasy dungeon.
+    response = generate_structured_response(_room_description_prompt(room_type, existing_rooms),
+                                            call_site="room_description", deadline=deadline)
+    return response or random.choice(FALLBACK_RESPONSES["description"])
+
+def _room_description_prompt(room_type: str, existing_rooms: List[str]) -> str:
+    return f"""Generate a vivid 1-2 sentence description for a {room_type} in a fantasy dungeon.
 
 Connected Rooms: {', '.join(existing_rooms[:3]) if existing_rooms else "None"}
 
@@ -304,12 +689,14 @@ Requirements:
 - Hint at possible secrets
 - Match the dungeon's overall tone"""
 
-    response = generate_structured_response(prompt)
-    return response or random.choice(FALLBACK_RESPONSES["description"])
-
-def generate_room_name(room_type: str, theme: str) -> str:
+def generate_room_name(room_type: str, theme: str, deadline: float = DEFAULT_DEADLINE) -> str:
     # Generate short room name (2–3 words)
-    prompt = f"""Generate a short, punchy name (2-3 words max) for a {room_type} in a {theme} dungeon.
+    response = generate_structured_response(_room_name_prompt(room_type, theme), call_site="room_name",
+                                            deadline=deadline)
+    return _finish_room_name(response)
+
+def _room_name_prompt(room_type: str, theme: str) -> str:
+    return f"""Generate a short, punchy name (2-3 words max) for a {room_type} in a {theme} dungeon.
 
 Examples:
 - "Chamber of Whispers" 
@@ -318,10 +705,154 @@ Examples:
 
 Respond ONLY with the name, no other text:"""
 
-    response = generate_structured_response(prompt)
+def _finish_room_name(response: Optional[str]) -> str:
     if response:
         response = response.split('\n')[0].strip('"\'')
         if len(response.split()) <= 3:
             return response
 
-    return random.choice(FALLBACK_RESPONSES["name"])
\ No newline at end of file
+    return random.choice(FALLBACK_RESPONSES["name"])
+
+def generate_npc_greeting(npc_name: str, theme: str, deadline: float = DEFAULT_DEADLINE) -> str:
+    # One opening line for an NPC placed in a new room; "" if the model gave nothing usable
+    response = generate_structured_response(_npc_greeting_prompt(npc_name, theme), temperature=0.8,
+                                            max_length=40, call_site="npc_flavor", deadline=deadline)
+    return response.split('\n')[0].strip('"\' ') if response else ""
+
+def _npc_greeting_prompt(npc_name: str, theme: str) -> str:
+    return f"""Write the first line a {npc_name} says to an adventurer they meet in a {theme} dungeon.
+
+Respond ONLY with the line, one short sentence:"""
+
+# ---------------------------------------------------------------------------
+# Asyncio API: same prompts, caching and fallbacks as the blocking functions,
+# through the backend's async chat with a bounded number of in-flight requests.
+# ---------------------------------------------------------------------------
+
+_SEMAPHORES: Dict[int, tuple] = {}  # id(event loop) -> (loop, semaphore)
+
+def _async_semaphore() -> "asyncio.Semaphore":
+    # A Semaphore is bound to the loop that created it
+    import asyncio  # only async callers pay for the asyncio import
+    loop = asyncio.get_running_loop()
+    entry = _SEMAPHORES.get(id(loop))
+    if entry is None or entry[0] is not loop:
+        for key in [k for k, (l, _) in _SEMAPHORES.items() if l.is_closed()]:
+            del _SEMAPHORES[key]
+        entry = (loop, asyncio.Semaphore(MAX_CONCURRENT_REQUESTS))
+        _SEMAPHORES[id(loop)] = entry
+    return entry[1]
+
+async def agenerate_structured_response(
+        prompt: str,
+        model: Optional[str] = None,
+        response_format: str = "text",
+        temperature: float = 0.7,
+        max_length: int = 150,
+        call_site: str = "default",
+        use_cache: Optional[bool] = None,
+        deadline: float = DEFAULT_DEADLINE,
+        schema: Optional[Dict] = None
+) -> Union[str, Dict, None]:
+    # Async counterpart of generate_structured_response
+    model = model or ROUTER.model_for(call_site)
+    if use_cache is None:
+        use_cache = CACHE_POLICY.get(call_site, True)
+    schema = _schema_for(response_format, call_site, schema)
+    cache_key = _cache_key(model, prompt, temperature, response_format, max_length, schema)
+    with PERF.measure(f"llm.{call_site}") as counters:
+        if use_cache:
+            cached = RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                counters["cache_hits"] = 1
+                return cached
+
+        result = await IN_FLIGHT.ado(cache_key, _aquery_model, prompt, model, response_format, temperature,
+                                     max_length, deadline=deadline, call_site=call_site, schema=schema)
+        if result is None:
+            counters["fallbacks"] = 1
+        elif use_cache:
+            RESPONSE_CACHE.put(cache_key, result)
+        return result
+
+async def _aquery_model(
+        prompt: str,
+        model: str,
+        response_format: str,
+        temperature: float,
+        max_length: int,
+        deadline: float = DEFAULT_DEADLINE,
+        call_site: str = "default",
+        schema: Optional[Dict] = None
+) -> Union[str, Dict, None]:
+    semaphore = _async_semaphore()
+    expires = time.monotonic() + deadline
+    for attempt in range(MAX_RETRIES):
+        if not BREAKER.allow():
+            PERF.incr(f"llm.{call_site}", "short_circuited")
+            return None
+
+        try:
+            async with semaphore:
+                started = time.perf_counter()  # queueing for the semaphore isn't model latency
+                model, response = await _arouted_chat(
+                    call_site,
+                    model,
+                    messages=[{'role': 'user', 'content': prompt}],
+                    options={'temperature': temperature, 'num_predict': max_length},
+                    format=_format_for(response_format, schema),
+                    timeout=expires - time.monotonic()
+                )
+        except Exception as e:
+            if not is_model_missing(e):
+                BREAKER.record_failure()
+            print(f"Attempt {attempt + 1} failed: {str(e)}")
+        else:
+            BREAKER.record_success()
+            ROUTER.observe(call_site, model, time.perf_counter() - started)
+            _record_tokens(call_site, prompt, response)
+            try:
+                return _parse_content(response['message']['content'], response_format, call_site, schema)
+            except Exception as e:
+                print(f"Attempt {attempt + 1} returned unusable output: {str(e)}")
+
+        delay = backoff_delay(attempt)
+        if attempt == MAX_RETRIES - 1 or time.monotonic() + delay >= expires:
+            break
+        PERF.incr(f"llm.{call_site}", "retries")
+        import asyncio
+        await asyncio.sleep(delay)
+
+    print("Max retries reached for Ollama query")
+    return None
+
+async def agenerate_dialogue(
+        npc_name: str,
+        npc_background: str,
+        player_input: str,
+        context: str = "",
+        memory: List[Dict] = None
+) -> str:
+    prompt = _dialogue_prompt(npc_name, npc_background, player_input, context, memory)
+    response = await agenerate_structured_response(prompt, temperature=0.8, call_site="dialogue")
+    return _finish_dialogue(response)
+
+async def agenerate_room_content(
+        room_type: str,
+        theme: str,
+        connected_rooms: List[str],
+        existing_descriptions: List[str] = None
+) -> Dict:
+    prompt = _room_content_prompt(room_type, theme, connected_rooms, existing_descriptions)
+    content = await agenerate_structured_response(prompt, response_format="json", temperature=0.6,
+                                                  call_site="room_content")
+    return _finish_room_content(content, room_type, theme)
+
+async def agenerate_room_description(room_type: str, existing_rooms: List[str]) -> str:
+    response = await agenerate_structured_response(_room_description_prompt(room_type, existing_rooms),
+                                                   call_site="room_description")
+    return response or random.choice(FALLBACK_RESPONSES["description"])
+
+async def agenerate_room_name(room_type: str, theme: str) -> str:
+    response = await agenerate_structured_response(_room_name_prompt(room_type, theme), call_site="room_name")
+    return _finish_room_name(response)
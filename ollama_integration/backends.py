@@ -0,0 +1,296 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+# Connection defaults for the managed Ollama client
+OLLAMA_TIMEOUT = 30.0  # seconds per HTTP request
+OLLAMA_KEEP_ALIVE = "30m"  # how long the server keeps a model loaded after the last request
+
+# Canned replies per call site, used by the fake backend and the stand-in server
+CANNED_RESPONSES: Dict[str, List[str]] = {
+    "dialogue": [
+        "Welcome, traveler. These halls remember more than they tell.",
+        "Keep your torch high; the dark down here is hungry.",
+        "I have seen many like you come through. Few return."
+    ],
+    "room_type": [json.dumps({"room_type": t}) for t in ("chamber", "hallway", "cavern", "shrine", "treasure")],
+    "room_name": ["Hall of Echoes", "Sunken Vault", "Whispering Gallery"],
+    "room_description": [
+        "Water drips from cracked flagstones while a cold draft carries the smell of rust.",
+        "Faded murals cover the walls, and something scrapes softly behind the stone."
+    ],
+    "room_content": [json.dumps({
+        "name": "Gallery of Bones",
+        "description": "Rows of niches hold yellowed skulls. A faint chant echoes from nowhere.",
+        "features": ["bone niches", "cracked altar", "cold draft"],
+        "mood": "ominous",
+        "lore": "The ossuary keepers were buried with their keys."
+    })],
+    "puzzle": [json.dumps({
+        "description": "Three levers bear the symbols of moon, star and sun.",
+        "solution": "moon,star,sun",
+        "hints": ["Night comes before day", "Follow the sky from dusk", "Moon, then star, then sun"],
+        "reward": "enchanted_gem"
+    })],
+    "quest": [json.dumps({
+        "title": "The Lost Ledger",
+        "description": "A ledger of debts went missing in the lower halls. Its owner wants it back.",
+        "objectives": [{"description": "Find the ledger in the lower halls", "completed": False}],
+        "reward": {"item": "gold_coins", "xp": 120}
+    })],
+    "npc_flavor": ["Careful where you step, stranger.", "Another visitor? The halls have been restless lately."],
+    "npc_summary": ["The adventurer has visited before, asked about the lower halls and promised to return."],
+    "combat_action": ["attack", "block"],
+    "tactical_combat": ["attack", "defend"],
+    "default": ["The dungeon is silent."]
+}
+
+# Prompt fragments identifying each call site (checked in order), for callers that only send text
+CALL_SITE_PATTERNS = [
+    ("dialogue", re.compile(r"Roleplay as")),
+    ("npc_summary", re.compile(r"Update the memory summary")),
+    ("npc_flavor", re.compile(r"Write the first line a")),
+    ("room_type", re.compile(r"select the most appropriate room type")),
+    ("room_name", re.compile(r"short, punchy name")),
+    ("room_description", re.compile(r"vivid 1-2 sentence description")),
+    ("room_content", re.compile(r"Generate descriptive content")),
+    ("tactical_combat", re.compile(r"combat AI")),
+    ("combat_action", re.compile(r"in combat, choose your next action")),
+    ("puzzle", re.compile(r"puzzle", re.IGNORECASE)),
+    ("quest", re.compile(r"quest", re.IGNORECASE))
+]
+
+
+def _ollama():
+    # The ollama package pulls in httpx and pydantic; only pay for that on the first real model call
+    import ollama
+    return ollama
+
+
+def is_model_missing(error: Exception) -> bool:
+    # Ollama answers 404 "model ... not found" for a model that was never pulled: a routing
+    # problem for that one model, not a sign the host is down
+    if getattr(error, "status_code", None) == 404:
+        return True
+    message = str(error).lower()
+    return "model" in message and "not found" in message
+
+
+def detect_call_site(prompt: str) -> str:
+    for call_site, pattern in CALL_SITE_PATTERNS:
+        if pattern.search(prompt):
+            return call_site
+    return "default"
+
+
+def canned_reply(call_site: str, prompt: str, responses: Dict[str, List[str]] = None) -> str:
+    # Deterministic choice: the same prompt always gets the same reply
+    responses = responses or CANNED_RESPONSES
+    replies = responses.get(call_site) or responses.get("default") or [""]
+    digest = int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16)
+    return replies[digest % len(replies)]
+
+
+class LatencyModel:
+    # Time-to-first-token distribution plus a decode throughput, e.g. "lognormal:0.8:0.3" or "fixed:0.2"
+    def __init__(self, kind: str = "fixed", mean: float = 0.0, spread: float = 0.0,
+                 tokens_per_sec: float = 0.0, seed: Optional[int] = 0):
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self.tokens_per_sec = tokens_per_sec
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, tokens_per_sec: float = 0.0, seed: Optional[int] = 0) -> "LatencyModel":
+        parts = spec.split(":")
+        kind = parts[0]
+        mean = float(parts[1]) if len(parts) > 1 else 0.0
+        spread = float(parts[2]) if len(parts) > 2 else 0.0
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        return cls(kind, mean, spread, tokens_per_sec, seed)
+
+    def first_token_delay(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                return max(0.0, self._rng.uniform(self.mean - self.spread, self.mean + self.spread))
+            if self.kind == "lognormal" and self.mean > 0:
+                # spread is the sigma of the underlying normal; the median equals mean
+                return self._rng.lognormvariate(math.log(self.mean), self.spread)
+        return self.mean
+
+    def token_delay(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+
+def split_tokens(text: str) -> List[str]:
+    # Rough word-level tokens that keep their trailing whitespace
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class LLMBackend:
+    # Interface every model backend implements; replies use Ollama's chat response shape.
+    # timeout is how long this one request may take (the rest of the caller's deadline);
+    # None means the backend's own default.
+    name = "base"
+
+    def chat(self, model: str, messages: List[Dict], options: Dict = None, stream: bool = False,
+             format=None, call_site: str = "default", timeout: Optional[float] = None):
+        raise NotImplementedError
+
+    async def achat(self, model: str, messages: List[Dict], options: Dict = None,
+                    format=None, call_site: str = "default", timeout: Optional[float] = None) -> Dict:
+        # Default: run the blocking call in a worker thread
+        import asyncio  # imported on first async call; most sessions never make one
+        return await asyncio.to_thread(self.chat, model, messages, options, False, format, call_site, timeout)
+
+    def warm_up(self, model: str) -> None:
+        # Load a model ahead of the first real request; nothing to do by default
+        return None
+
+
+class OllamaBackend(LLMBackend):
+    # Talks to a real Ollama server (or the stand-in server) through one pooled, keep-alive client
+    name = "ollama"
+
+    def __init__(self, host: str = None, timeout: float = OLLAMA_TIMEOUT, keep_alive: str = OLLAMA_KEEP_ALIVE):
+        self.host = host  # None lets the ollama package use OLLAMA_HOST or its default
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self._client = None  # created on first use; reuses HTTP connections after that
+        self._budget_clients: Dict[int, object] = {}  # whole seconds of timeout -> Client
+        self._client_lock = threading.Lock()
+        self._async_clients: Dict[int, tuple] = {}  # id(event loop) -> (loop, AsyncClient)
+
+    def _sync_client(self, timeout: Optional[float] = None):
+        # The ollama Client only takes a timeout when it's built, so a budget tighter than the default
+        # gets a pooled client per whole second of budget; an attempt overruns its deadline by < 1s
+        if timeout is not None and timeout < self.timeout:
+            seconds = max(1, math.ceil(timeout))
+            client = self._budget_clients.get(seconds)
+            if client is None:
+                with self._client_lock:
+                    client = self._budget_clients.get(seconds)
+                    if client is None:
+                        client = self._budget_clients[seconds] = _ollama().Client(host=self.host, timeout=seconds)
+            return client
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = _ollama().Client(host=self.host, timeout=self.timeout)
+        return self._client
+
+    def chat(self, model, messages, options=None, stream=False, format=None, call_site="default", timeout=None):
+        kwargs = {"model": model, "messages": messages, "options": options or {}, "stream": stream,
+                  "keep_alive": self.keep_alive}
+        if format:
+            kwargs["format"] = format
+        return self._sync_client(timeout).chat(**kwargs)
+
+    async def achat(self, model, messages, options=None, format=None, call_site="default", timeout=None):
+        kwargs = {"model": model, "messages": messages, "options": options or {}, "keep_alive": self.keep_alive}
+        if format:
+            kwargs["format"] = format
+        import asyncio
+        return await asyncio.wait_for(self._async_client().chat(**kwargs), timeout)
+
+    def warm_up(self, model: str) -> None:
+        # An empty generate request makes the server load the model and keep it resident
+        self._sync_client().generate(model=model, prompt="", keep_alive=self.keep_alive)
+
+    def _async_client(self):
+        # AsyncClient is bound to the loop that created it
+        import asyncio
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(id(loop))
+        if entry is None or entry[0] is not loop:
+            for key in [k for k, (l, _) in self._async_clients.items() if l.is_closed()]:
+                del self._async_clients[key]
+            entry = (loop, _ollama().AsyncClient(host=self.host, timeout=self.timeout))
+            self._async_clients[id(loop)] = entry
+        return entry[1]
+
+
+class FakeBackend(LLMBackend):
+    # In-process stand-in with canned replies and simulated latency; needs no model, GPU or network
+    name = "fake"
+
+    def __init__(self, latency: LatencyModel = None, responses: Dict[str, List[str]] = None):
+        self.latency = latency or LatencyModel()
+        self.responses = responses or CANNED_RESPONSES
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _reply(self, messages: List[Dict], call_site: str) -> str:
+        prompt = messages[-1]["content"] if messages else ""
+        if call_site == "default":
+            call_site = detect_call_site(prompt)
+        with self._lock:
+            self.calls[call_site] = self.calls.get(call_site, 0) + 1
+        return canned_reply(call_site, prompt, self.responses)
+
+    def chat(self, model, messages, options=None, stream=False, format=None, call_site="default", timeout=None):
+        text = self._reply(messages, call_site)
+        tokens = split_tokens(text)
+        if stream:
+            return self._stream(model, tokens)
+        delay = self.latency.first_token_delay() + self.latency.token_delay() * len(tokens)
+        if timeout is not None and delay > timeout:
+            time.sleep(max(0.0, timeout))
+            raise TimeoutError(f"fake model took longer than {timeout:.2f}s")
+        time.sleep(delay)
+        return _chat_response(model, text, messages, len(tokens))
+
+    async def achat(self, model, messages, options=None, format=None, call_site="default", timeout=None):
+        text = self._reply(messages, call_site)
+        tokens = split_tokens(text)
+        import asyncio
+        delay = self.latency.first_token_delay() + self.latency.token_delay() * len(tokens)
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(max(0.0, timeout))
+            raise TimeoutError(f"fake model took longer than {timeout:.2f}s")
+        await asyncio.sleep(delay)
+        return _chat_response(model, text, messages, len(tokens))
+
+    def _stream(self, model: str, tokens: List[str]) -> Iterator[Dict]:
+        time.sleep(self.latency.first_token_delay())
+        for token in tokens:
+            yield {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+            time.sleep(self.latency.token_delay())
+        yield {"model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+               "eval_count": len(tokens)}
+
+
+def _chat_response(model: str, text: str, messages: List[Dict], eval_count: int) -> Dict:
+    prompt_tokens = sum(len(split_tokens(m.get("content", ""))) for m in messages)
+    return {
+        "model": model,
+        "message": {"role": "assistant", "content": text},
+        "done": True,
+        "prompt_eval_count": prompt_tokens,
+        "eval_count": eval_count
+    }
+
+
+def create_backend(name: str = None) -> LLMBackend:
+    # Pick a backend by name; DUNGEON_LLM_BACKEND selects it when not given
+    name = (name or os.environ.get("DUNGEON_LLM_BACKEND", "ollama")).lower()
+    if name == "fake":
+        spec = os.environ.get("DUNGEON_FAKE_LATENCY", "fixed:0")
+        tps = float(os.environ.get("DUNGEON_FAKE_TPS", "0"))
+        return FakeBackend(LatencyModel.parse(spec, tps))
+    if name == "ollama":
+        return OllamaBackend(
+            host=os.environ.get("OLLAMA_HOST"),
+            timeout=float(os.environ.get("DUNGEON_LLM_TIMEOUT", OLLAMA_TIMEOUT)),
+            keep_alive=os.environ.get("DUNGEON_LLM_KEEP_ALIVE", OLLAMA_KEEP_ALIVE)
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,76 @@
+import random
+import threading
+import time
+from typing import Dict
+
+# Default breaker and backoff settings
+FAILURE_THRESHOLD = 3  # consecutive failures before the breaker opens
+RESET_TIMEOUT = 30.0  # seconds to stay open before letting a probe through
+BACKOFF_BASE = 0.5  # seconds, doubled on every attempt
+BACKOFF_CAP = 4.0  # longest single backoff sleep
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    # Exponential backoff with full jitter so callers don't retry in lockstep
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    # Shared closed/open/half-open breaker guarding calls to the model host
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {"trips": 0, "short_circuited": 0, "successes": 0, "failures": 0}
+
+    def allow(self) -> bool:
+        # Whether a call may go to the model right now
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True  # exactly one probe tests the host
+                return True
+
+            self.stats["short_circuited"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats["successes"] += 1
+            self._failures = 0
+            self._probe_in_flight = False
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.stats["trips"] += 1
+                    print(f"[LLM] Circuit breaker opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["state"] = self.state
+            stats["consecutive_failures"] = self._failures
+            if self.state == self.OPEN:
+                stats["retry_in"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+        return stats
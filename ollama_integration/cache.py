@@ -0,0 +1,162 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+# Default cache settings
+CACHE_DIR = Path(__file__).resolve().parent.parent / "saves" / "llm_cache"
+MEMORY_CACHE_SIZE = 256  # entries kept in the in-process LRU
+DISK_CACHE_SIZE = 2000  # entries kept on disk before the oldest are evicted
+CACHE_TTL = 7 * 24 * 3600  # seconds before a disk entry is considered stale
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Collapse whitespace so cosmetic prompt differences share a cache entry
+    return " ".join(prompt.split())
+
+
+class ResponseCache:
+    # Two-tier cache for model responses: in-process LRU backed by JSON files on disk
+    def __init__(
+            self,
+            cache_dir: Union[str, Path, None] = CACHE_DIR,
+            memory_size: int = MEMORY_CACHE_SIZE,
+            disk_size: int = DISK_CACHE_SIZE,
+            ttl: float = CACHE_TTL
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._disk_index: Optional[Dict[str, float]] = None  # key -> created time, loaded lazily
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float,
+                 response_format: str, max_length: int = 0) -> str:
+        # Hash everything that influences the model output
+        raw = json.dumps([model, normalize_prompt(prompt), round(temperature, 3), response_format, max_length])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any:
+        # Look up a response, checking memory first and then disk
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return copy.deepcopy(self._memory[key])
+
+            value = self._read_disk(key)
+            if value is not None:
+                self._remember(key, value)
+                self.stats["disk_hits"] += 1
+                return copy.deepcopy(value)
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        # Store a response in both tiers
+        if value is None:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+            self._write_disk(key, value)
+            self.stats["stores"] += 1
+
+    def clear(self):
+        # Drop every cached response from memory and disk
+        with self._lock:
+            self._memory.clear()
+            for key in list(self._load_index()):
+                self._remove_disk(key)
+
+    def hit_ratio(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def get_stats(self) -> Dict:
+        # Snapshot of hit/miss counters for reporting
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = len(self._disk_index) if self._disk_index is not None else None
+        stats["hit_ratio"] = round(self.hit_ratio(), 3)
+        return stats
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load_index(self) -> Dict[str, float]:
+        # Scan the cache directory once to learn which entries exist
+        if self._disk_index is None:
+            self._disk_index = {}
+            if self.cache_dir and self.cache_dir.exists():
+                for f in self.cache_dir.glob("*.json"):
+                    try:
+                        self._disk_index[f.stem] = f.stat().st_mtime
+                    except OSError:
+                        pass
+        return self._disk_index
+
+    def _read_disk(self, key: str) -> Any:
+        if not self.cache_dir or key not in self._load_index():
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except Exception:
+            self._remove_disk(key)
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            self._remove_disk(key)
+            self.stats["evictions"] += 1
+            return None
+        return entry.get("value")
+
+    def _write_disk(self, key: str, value: Any):
+        if not self.cache_dir:
+            return
+        index = self._load_index()
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            now = time.time()
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                json.dump({"created": now, "value": value}, f)
+            index[key] = now
+        except Exception as e:
+            print(f"[Cache] Failed to write entry {key[:8]}: {e}")
+            return
+
+        # Evict expired entries first, then the oldest until under the size limit
+        now = time.time()
+        for stale in [k for k, created in index.items() if now - created > self.ttl]:
+            self._remove_disk(stale)
+            self.stats["evictions"] += 1
+        if len(index) > self.disk_size:
+            for oldest in sorted(index, key=index.get)[:len(index) - self.disk_size]:
+                self._remove_disk(oldest)
+                self.stats["evictions"] += 1
+
+    def _remove_disk(self, key: str):
+        if self._disk_index is not None:
+            self._disk_index.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
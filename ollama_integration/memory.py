@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+from urllib.parse import quote, unquote
+
+from perf_metrics import PERF
+from .retrieval import MemoryVectors, _numpy, exchange_text, top_k
+from write_behind import atomic_write_text
+
+# Default memory settings
+MEMORY_DIR = Path(__file__).resolve().parent.parent / "data" / "npcs" / "memory"
+RING_SIZE = 50  # exchanges kept per NPC in RAM; older ones only live on in the shard until compaction
+MEMORY_CAP_BYTES = 4 * 1024 * 1024  # rough size of all loaded rings before the least recent are dropped
+COMPACT_FACTOR = 4  # a shard is rewritten to the ring once it holds this many rings' worth of lines
+RECENT_EXCHANGES = 1  # newest exchanges always recalled, for continuity
+
+
+class MemoryRing:
+    # One NPC's recent exchanges; list-like for readers, and every append is one line on its shard
+    def __init__(self, store: "NPCMemoryStore", npc_id: str, exchanges: Iterable[Dict] = (), lines: int = 0):
+        self.store = store
+        self.npc_id = npc_id
+        self._items = deque(maxlen=store.ring_size)
+        self._vectors: Optional[MemoryVectors] = None  # built on the first recall
+        self.size = 0  # approximate bytes held, for the store's cap
+        self.lines = lines  # lines in the shard, including ones that fell out of the ring
+        for exchange in exchanges:
+            self._push(exchange, json.dumps(exchange))
+
+    def _push(self, exchange: Dict, line: str):
+        if len(self._items) == self._items.maxlen:
+            self.size -= self._items[0][1]
+        self._items.append((exchange, len(line)))
+        self.size += len(line)
+        if self._vectors is not None:
+            self._vectors.push(exchange_text(exchange))
+
+    def _drop_oldest(self, count: int):
+        for _ in range(min(count, len(self._items))):
+            self.size -= self._items.popleft()[1]
+        if self._vectors is not None:
+            self.size -= self._vectors.nbytes  # rebuilt on the next recall
+            self._vectors = None
+
+    def append(self, exchange: Dict):
+        line = json.dumps(exchange)
+        self._push(exchange, line)
+        self.store._append(self, line)
+
+    def extend(self, exchanges: Iterable[Dict]):
+        for exchange in exchanges:
+            self.append(exchange)
+
+    def recall(self, query: str, k: int, recent: int = RECENT_EXCHANGES) -> List[Dict]:
+        # Up to k exchanges, oldest first: the newest `recent` plus the older ones closest to query.
+        # Falls back to the last k when NumPy is missing or nothing matches.
+        items = list(self)
+        if len(items) <= k:
+            return items
+        recent = min(recent, k)
+        older = items[:len(items) - recent]
+        with PERF.measure("npc.recall") as counters:
+            picked = top_k(self._index(), query, [exchange_text(exchange) for exchange in older], k - recent)
+            counters["recalled"] = len(picked)
+        if not picked:
+            return items[-k:]
+        return [older[i] for i in picked] + items[len(items) - recent:]
+
+    def _index(self) -> Optional[MemoryVectors]:
+        if self._vectors is None and _numpy() is not None:
+            vectors = MemoryVectors(self._items.maxlen)
+            for exchange in self:
+                vectors.push(exchange_text(exchange))
+            self._vectors = vectors
+            self.size += vectors.nbytes
+        return self._vectors
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [exchange for exchange, _ in list(self._items)[index]]
+        return self._items[index][0]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (exchange for exchange, _ in list(self._items))
+
+    def __repr__(self) -> str:
+        return f"MemoryRing({self.npc_id!r}, {list(self)!r})"
+
+
+class NPCMemoryStore(MutableMapping):
+    # npc id -> MemoryRing. Each NPC has its own append-only JSON-lines shard, read the first time
+    # that NPC is looked up; loaded rings are dropped least-recent-first past the byte cap.
+    def __init__(
+            self,
+            directory: Union[str, Path, None] = MEMORY_DIR,
+            ring_size: int = RING_SIZE,
+            cap_bytes: int = MEMORY_CAP_BYTES
+    ):
+        self.directory = Path(directory) if directory else None  # None keeps memories in RAM only
+        self.ring_size = ring_size
+        self.cap_bytes = cap_bytes
+        self._rings: "OrderedDict[str, MemoryRing]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {"loads": 0, "appends": 0, "evictions": 0, "compactions": 0}
+
+    def _shard(self, npc_id: str) -> Optional[Path]:
+        return self.directory / f"{quote(npc_id, safe='')}.jsonl" if self.directory else None
+
+    def __getitem__(self, npc_id: str) -> MemoryRing:
+        with self._lock:
+            ring = self._rings.get(npc_id)
+            if ring is None:
+                ring = self._load(npc_id)
+                if ring is None:
+                    raise KeyError(npc_id)
+                self._rings[npc_id] = ring
+                self._evict()
+            self._rings.move_to_end(npc_id)
+            return ring
+
+    def _load(self, npc_id: str) -> Optional[MemoryRing]:
+        shard = self._shard(npc_id)
+        if shard is None or not shard.exists():
+            return None
+        with PERF.measure("io.npc_memory_load") as counters:
+            exchanges = []
+            with open(shard, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        exchanges.append(json.loads(line))
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+            counters["exchanges"] = len(exchanges)
+            self.stats["loads"] += 1
+        return MemoryRing(self, npc_id, exchanges[-self.ring_size:], lines=len(exchanges))
+
+    def __setitem__(self, npc_id: str, exchanges: Iterable[Dict]):
+        # Replace an NPC's memory outright (e.g. seeding from npc_storage.json)
+        with self._lock:
+            ring = MemoryRing(self, npc_id, list(exchanges)[-self.ring_size:])
+            self._rings[npc_id] = ring
+            self._rings.move_to_end(npc_id)
+            shard = self._shard(npc_id)
+            if len(ring) or (shard is not None and shard.exists()):
+                self._compact(ring)
+            self._evict()
+
+    def setdefault(self, npc_id: str, default: Iterable[Dict] = ()) -> MemoryRing:
+        # Unlike the dict version this always returns the stored ring, never `default` itself
+        with self._lock:
+            if npc_id not in self:
+                self[npc_id] = default
+            return self[npc_id]
+
+    def fold(self, npc_id: str, exchanges: List[Dict]) -> int:
+        # Drop exchanges a summary now covers, as far as they're still the oldest held
+        # (some may already have rolled out of the ring); returns how many were dropped. The live ring
+        # is trimmed in place, so a conversation holding it keeps appending to the same ring.
+        with self._lock:
+            if not exchanges or npc_id not in self:
+                return 0
+            ring = self[npc_id]
+            items = list(ring)
+            for start in range(len(exchanges)):
+                covered = exchanges[start:]
+                if items[:len(covered)] == covered:
+                    ring._drop_oldest(len(covered))
+                    self._compact(ring)
+                    return len(covered)
+            return 0
+
+    def __delitem__(self, npc_id: str):
+        with self._lock:
+            found = self._rings.pop(npc_id, None) is not None
+            shard = self._shard(npc_id)
+            if shard is not None and shard.exists():
+                shard.unlink()
+                found = True
+            if not found:
+                raise KeyError(npc_id)
+
+    def __contains__(self, npc_id) -> bool:
+        if npc_id in self._rings:
+            return True
+        shard = self._shard(npc_id)
+        return shard is not None and shard.exists()
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            ids = list(self._rings)
+        if self.directory and self.directory.exists():
+            ids.extend(unquote(entry.name[:-len(".jsonl")]) for entry in os.scandir(self.directory)
+                       if entry.name.endswith(".jsonl"))
+        return iter(dict.fromkeys(ids))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def _append(self, ring: MemoryRing, line: str):
+        with self._lock:
+            self.stats["appends"] += 1
+            live = self._rings.get(ring.npc_id)
+            if live is None:
+                self._rings[ring.npc_id] = live = ring  # evicted while a conversation still held it
+            elif live is not ring:
+                live._push(json.loads(line), line)  # reloaded meanwhile; keep that copy current too
+            self._rings.move_to_end(ring.npc_id)
+            shard = self._shard(ring.npc_id)
+            if shard is not None:
+                with PERF.measure("io.npc_memory_append") as counters:
+                    shard.parent.mkdir(parents=True, exist_ok=True)
+                    with open(shard, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+                    counters["bytes"] = len(line) + 1
+                live.lines += 1
+                if live.lines >= COMPACT_FACTOR * self.ring_size:
+                    self._compact(live)
+            self._evict()
+
+    def _compact(self, ring: MemoryRing):
+        # Rewrite the shard to just what the ring still holds
+        shard = self._shard(ring.npc_id)
+        if shard is None:
+            return
+        with PERF.measure("io.npc_memory_compact"):
+            atomic_write_text(shard, "".join(json.dumps(exchange) + "\n" for exchange in ring))
+        ring.lines = len(ring)
+        self.stats["compactions"] += 1
+
+    def _evict(self):
+        # Everything is already on disk, so dropping a ring only costs a reload later
+        if self.directory is None:
+            return
+        total = sum(ring.size for ring in self._rings.values())
+        while total > self.cap_bytes and len(self._rings) > 1:
+            _, ring = self._rings.popitem(last=False)
+            total -= ring.size
+            self.stats["evictions"] += 1
+
+    def loaded_count(self) -> int:
+        return len(self._rings)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["loaded"] = len(self._rings)
+            stats["loaded_bytes"] = sum(ring.size for ring in self._rings.values())
+        return stats
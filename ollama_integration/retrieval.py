@@ -0,0 +1,90 @@
+import re
+import zlib
+from typing import List, Optional
+
+# Hashed bag-of-words settings
+HASH_DIM = 1024  # vector width; with signed hashing, collisions between the few words of two exchanges are rare
+_WORD = re.compile(r"[a-z0-9']+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "do", "for", "from", "have", "he", "her", "his",
+    "i", "in", "is", "it", "me", "my", "not", "of", "on", "or", "she", "so", "that", "the", "their", "them",
+    "there", "they", "this", "to", "was", "we", "what", "with", "you", "your"
+}
+
+_NUMPY = None
+
+
+def _numpy():
+    # NumPy is optional and slow to import, so it's loaded on the first recall; None if it isn't installed
+    global _NUMPY
+    if _NUMPY is None:
+        try:
+            import numpy
+            _NUMPY = numpy
+        except ImportError:
+            _NUMPY = False
+    return _NUMPY or None
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def exchange_text(exchange: dict) -> str:
+    return f"{exchange.get('player', '')} {exchange.get('npc', '')}"
+
+
+class MemoryVectors:
+    # Unit-length hashed bag-of-words rows in a fixed circular matrix that mirrors a MemoryRing
+    def __init__(self, capacity: int, dim: int = HASH_DIM):
+        np = _numpy()
+        self.dim = dim
+        self.rows = np.zeros((capacity, dim), dtype=np.float32)
+        self.count = 0  # rows ever pushed; the next one goes to count % capacity
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes
+
+    def embed(self, text: str):
+        np = _numpy()
+        words = tokenize(text)
+        if not words:
+            return np.zeros(self.dim, dtype=np.float32)
+        hashes = [zlib.crc32(word.encode("utf-8")) for word in words]
+        # One hash bit picks the sign, so two words sharing a slot cancel out as often as they add up
+        vector = np.bincount([h % self.dim for h in hashes], weights=[1 - 2 * ((h >> 31) & 1) for h in hashes],
+                             minlength=self.dim).astype(np.float32)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))  # dampen words repeated within one exchange
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def push(self, text: str):
+        self.rows[self.count % len(self.rows)] = self.embed(text)
+        self.count += 1
+
+    def scores(self, query: str):
+        # Cosine similarity of the query to every held row, oldest first
+        np = _numpy()
+        capacity = len(self.rows)
+        held = min(self.count, capacity)
+        order = np.arange(held) if self.count <= capacity else (self.count + np.arange(capacity)) % capacity
+        return self.rows[order] @ self.embed(query)
+
+
+def top_k(vectors: Optional[MemoryVectors], query: str, texts: List[str], k: int) -> List[int]:
+    # Positions (oldest first) of the k texts best matching query; [] if nothing matches.
+    # texts are the oldest rows' texts; vectors rank them, then a real shared word confirms
+    # each pick so hash collisions never pass for relevance.
+    words = set(tokenize(query))
+    if vectors is None or k <= 0 or not words:
+        return []
+    np = _numpy()
+    scores = vectors.scores(query)[:len(texts)]
+    picked = []
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] <= 0 or len(picked) == k:
+            break
+        if words & set(tokenize(texts[i])):
+            picked.append(int(i))
+    return sorted(picked)
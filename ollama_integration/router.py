@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+from perf_metrics import PERF
+
+# Model tiers, smallest first, each overridable with DUNGEON_<TIER>_MODEL
+# (e.g. DUNGEON_CLASSIFIER_MODEL=qwen2.5:0.5b). A tier whose model isn't pulled falls back to the
+# next installed tier (see ModelRouter.mark_missing), so the game still runs on llama3.2 alone.
+TIERS = ["classifier", "small", "large"]
+DEFAULT_TIER_MODELS = {
+    "classifier": os.environ.get("DUNGEON_CLASSIFIER_MODEL", "llama3.2:1b"),
+    "small": os.environ.get("DUNGEON_SMALL_MODEL", "llama3.2:1b"),
+    "large": os.environ.get("DUNGEON_LARGE_MODEL", "llama3.2")
+}
+
+# Call site -> (tier, latency SLO in seconds). The SLO covers one model call, or the time to first
+# token for streamed dialogue; unlisted call sites use "default".
+ROUTES: Dict[str, Tuple[str, float]] = {
+    "room_type": ("classifier", 0.5),  # one of five labels
+    "combat_action": ("classifier", 0.5),  # one action from a short list, mid-fight
+    "tactical_combat": ("classifier", 0.5),
+    "room_name": ("small", 1.0),
+    "room_description": ("small", 2.0),
+    "npc_flavor": ("small", 1.5),
+    "npc_summary": ("small", 10.0),  # runs in the background after a conversation
+    "dialogue": ("large", 1.5),
+    "room_content": ("large", 4.0),
+    "puzzle": ("large", 6.0),
+    "quest": ("large", 6.0),
+    "default": ("large", 8.0)
+}
+
+# Downgrade settings
+EWMA_ALPHA = 0.3  # weight of the newest latency sample
+MIN_SAMPLES = 3  # a single slow call (e.g. a cold model) never downgrades a site
+DOWNGRADE_COOLDOWN = 300.0  # seconds on the smaller tier before the configured one is tried again
+
+
+class ModelRouter:
+    # Picks the model for each call site from its tier. When the model a site is on keeps missing the
+    # site's SLO (smoothed latency over it), the site steps down one tier; after a cooldown it goes
+    # back to its configured tier and has to miss again to be downgraded again. A model the host
+    # doesn't have is skipped for the next tier up (or down, if nothing bigger is installed).
+    def __init__(
+            self,
+            routes: Dict[str, Tuple[str, float]] = None,
+            tier_models: Dict[str, str] = None,
+            cooldown: float = DOWNGRADE_COOLDOWN
+    ):
+        self.routes = dict(routes or ROUTES)
+        self.tier_models = dict(tier_models or DEFAULT_TIER_MODELS)
+        self.cooldown = cooldown
+        self._tier: Dict[str, int] = {}  # call site -> tier index while downgraded
+        self._downgraded_at: Dict[str, float] = {}
+        self._latency: Dict[str, float] = {}  # call site -> smoothed seconds on its current model
+        self._samples: Dict[str, int] = {}
+        self._missing: Set[str] = set()  # models the host answered "not found" for
+        self._lock = threading.Lock()
+        self.events: List[Dict] = []  # downgrades, oldest first
+        self.stats = {"downgrades": 0, "restores": 0, "missing_models": 0}
+
+    def route(self, call_site: str) -> Tuple[str, float]:
+        return self.routes.get(call_site) or self.routes["default"]
+
+    def model_for(self, call_site: str) -> str:
+        with self._lock:
+            return self._model(self._current_tier(call_site))
+
+    def _model(self, tier: int) -> str:
+        # The tier's model, or the nearest installed one: bigger tiers first, then smaller
+        for candidate in list(range(tier, len(TIERS))) + list(range(tier - 1, -1, -1)):
+            model = self.tier_models[TIERS[candidate]]
+            if model not in self._missing:
+                return model
+        return self.tier_models[TIERS[tier]]
+
+    def mark_missing(self, model: str):
+        # The host doesn't have this model: route its tiers elsewhere for the rest of the session
+        with self._lock:
+            if model in self._missing or model not in self.tier_models.values():
+                return
+            self._missing.add(model)
+            self.stats["missing_models"] += 1
+            replacement = self._model(TIERS.index(next(t for t in TIERS if self.tier_models[t] == model)))
+        print(f"[LLM] Model {model} is not installed; its call sites use {replacement} instead")
+
+    def _current_tier(self, call_site: str) -> int:
+        configured = TIERS.index(self.route(call_site)[0])
+        tier = self._tier.get(call_site)
+        if tier is None:
+            return configured
+        if time.monotonic() - self._downgraded_at[call_site] >= self.cooldown:
+            self._reset(call_site)
+            self.stats["restores"] += 1
+            return configured
+        return tier
+
+    def observe(self, call_site: str, model: str, seconds: float):
+        # Latency of one successful call; ignored unless it ran on the model the site is routed to
+        with self._lock:
+            tier = self._current_tier(call_site)
+            if model != self._model(tier):
+                return
+            slo = self.route(call_site)[1]
+            if seconds > slo:
+                PERF.incr(f"llm.{call_site}", "slo_misses")
+            previous = self._latency.get(call_site)
+            latency = seconds if previous is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+            self._latency[call_site] = latency
+            self._samples[call_site] = self._samples.get(call_site, 0) + 1
+            if latency <= slo or self._samples[call_site] < MIN_SAMPLES or tier == 0:
+                return
+            if self._model(tier - 1) == model:
+                return  # the smaller tier is the same model; stepping down wouldn't help
+            self._reset(call_site)
+            self._tier[call_site] = tier - 1
+            self._downgraded_at[call_site] = time.monotonic()
+            self.stats["downgrades"] += 1
+            event = {"call_site": call_site, "from": model, "to": self._model(tier - 1),
+                     "latency": round(latency, 3), "slo": slo}
+            self.events.append(event)
+        PERF.incr(f"llm.{call_site}", "downgrades")
+        print(f"[LLM] {call_site}: {event['from']} averaged {event['latency']}s against a {slo}s SLO, "
+              f"using {event['to']} for now")
+
+    def _reset(self, call_site: str):
+        self._tier.pop(call_site, None)
+        self._downgraded_at.pop(call_site, None)
+        self._latency.pop(call_site, None)
+        self._samples.pop(call_site, None)
+
+    def models(self) -> List[str]:
+        # Every model some call site is routed to, smallest tier first (for warm-up)
+        used = {tier for tier, _ in self.routes.values()}
+        with self._lock:
+            return list(dict.fromkeys(self._model(i) for i, tier in enumerate(TIERS) if tier in used))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["routes"] = {
+                call_site: {
+                    "model": self._model(self._current_tier(call_site)),
+                    "slo": slo,
+                    "latency": round(self._latency[call_site], 3) if call_site in self._latency else None,
+                    "downgraded": call_site in self._tier
+                }
+                for call_site, (_, slo) in self.routes.items()
+            }
+            stats["events"] = list(self.events)
+            stats["missing"] = sorted(self._missing)
+        return stats
@@ -0,0 +1,316 @@
+import ast
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+
+# Typed views of the validated results
+class RoomContent(TypedDict, total=False):
+    name: str
+    description: str
+    features: List[str]
+    mood: str
+    lore: str
+
+
+class PuzzleData(TypedDict):
+    description: str
+    solution: str
+    hints: List[str]
+    reward: str
+
+
+class QuestObjective(TypedDict):
+    description: str
+    completed: bool
+
+
+class QuestData(TypedDict):
+    title: str
+    description: str
+    objectives: List[QuestObjective]
+    reward: Dict[str, Any]
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def choice_schema(field: str, options: List[str]) -> Dict:
+    # Object with a single field restricted to one of the given options
+    return {
+        "type": "object",
+        "properties": {field: {"type": "string", "enum": list(options)}},
+        "required": [field]
+    }
+
+
+# JSON schemas per call site, sent to Ollama's structured-output `format` parameter
+SCHEMAS: Dict[str, Dict] = {
+    "room_content": {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "description": {"type": "string"},
+            "features": {"type": "array", "items": {"type": "string"}, "default": []},
+            "mood": {"type": "string", "default": "eerie"},
+            "lore": {"type": "string"}
+        },
+        "required": ["name", "description", "features", "mood"]
+    },
+    "puzzle": {
+        "type": "object",
+        "properties": {
+            "description": {"type": "string"},
+            "solution": {"type": "string"},
+            "hints": {"type": "array", "items": {"type": "string"}, "default": []},
+            "reward": {"type": "string", "default": "mysterious_key"}
+        },
+        "required": ["description", "solution", "hints", "reward"]
+    },
+    "quest": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "description": {"type": "string"},
+            "objectives": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "description": {"type": "string"},
+                        "completed": {"type": "boolean", "default": False}
+                    },
+                    "required": ["description", "completed"]
+                }
+            },
+            "reward": {
+                "type": "object",
+                "properties": {
+                    "item": {"type": "string", "default": "gold_coins"},
+                    "xp": {"type": "integer", "default": 100}
+                },
+                "required": ["item", "xp"]
+            }
+        },
+        "required": ["title", "description", "objectives", "reward"]
+    },
+    "room_type": choice_schema("room_type", ["chamber", "hallway", "treasure", "shrine", "cavern"])
+}
+
+
+# ---------------------------------------------------------------------------
+# Tolerant parsing: one pass over the text that strips fences and chatter,
+# drops trailing commas and closes whatever a truncated reply left open.
+# ---------------------------------------------------------------------------
+
+FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+PY_LITERALS = {"True": "true", "False": "false", "None": "null"}  # Python -> JSON
+JSON_LITERALS = {v: k for k, v in PY_LITERALS.items()}  # JSON -> Python
+
+
+def parse_json(text: str) -> Tuple[Any, bool]:
+    # Returns (value, repaired); raises SchemaError if nothing usable is found
+    if text is None:
+        raise SchemaError("Empty response")
+    text = text.strip()
+    fenced = FENCE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+
+    start = min([i for i in (text.find("{"), text.find("[")) if i >= 0], default=-1)
+    if start < 0:
+        raise SchemaError("No JSON object in response")
+
+    try:
+        return json.loads(_repair(text[start:], PY_LITERALS)), True
+    except ValueError:
+        pass
+    try:
+        # Python-style dicts ('single quotes', True/None) without eval()
+        return ast.literal_eval(_repair(text[start:], JSON_LITERALS)), True
+    except (ValueError, SyntaxError):
+        raise SchemaError("Unrepairable JSON in response")
+
+
+def _repair(text: str, literals: Dict[str, str]) -> str:
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    quote = ""
+    escaped = False
+    word = ""
+
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                in_string = False
+            continue
+
+        if ch.isalpha():
+            word += ch
+            continue
+        if word:
+            out.append(literals.get(word, word))
+            word = ""
+
+        if ch in "\"'":
+            in_string, quote = True, ch
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+            if stack and stack[-1] == ch:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                return "".join(out)  # ignore chatter after the top-level value
+        else:
+            out.append(ch)
+    if word:
+        out.append(literals.get(word, word))
+
+    # Truncated reply: close the open string, drop a dangling key or comma, close containers
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append(quote)
+    tail = "".join(out).rstrip()
+    if stack and stack[-1] == "}":
+        tail = re.sub(r"""(,\s*)?(["'])[^"']*\2\s*:?\s*$""", "", tail) if re.search(
+            r"""[{,]\s*(["'])[^"']*\1\s*:?\s*$""", tail) else tail
+    tail = re.sub(r"[,:]\s*$", "", tail)
+    return tail + "".join(reversed(stack))
+
+
+def _strip_trailing_comma(out: List[str]):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+# ---------------------------------------------------------------------------
+# Validation into the schema's shape, coercing near-misses instead of failing
+# ---------------------------------------------------------------------------
+
+def validate(value: Any, schema: Dict, path: str = "$") -> Any:
+    kind = schema.get("type")
+    if "enum" in schema:
+        for option in schema["enum"]:
+            if str(value).strip().strip("\"'").lower() == str(option).lower():
+                return option
+        raise SchemaError(f"{path}: {value!r} is not one of {schema['enum']}")
+
+    if kind == "object":
+        if not isinstance(value, dict):
+            raise SchemaError(f"{path}: expected an object")
+        result = {}
+        for field, field_schema in schema.get("properties", {}).items():
+            if field in value and value[field] is not None:
+                result[field] = validate(value[field], field_schema, f"{path}.{field}")
+            elif "default" in field_schema:
+                result[field] = json.loads(json.dumps(field_schema["default"]))
+            elif field in schema.get("required", []):
+                raise SchemaError(f"{path}: missing required field '{field}'")
+        return result
+
+    if kind == "array":
+        if isinstance(value, (str, dict)):
+            value = [value]
+        if not isinstance(value, list):
+            raise SchemaError(f"{path}: expected a list")
+        items = schema.get("items", {})
+        return [validate(v, items, f"{path}[{i}]") for i, v in enumerate(value)]
+
+    if kind == "string":
+        if isinstance(value, (dict, list)):
+            raise SchemaError(f"{path}: expected a string")
+        return str(value)
+
+    if kind in ("integer", "number"):
+        if isinstance(value, bool):
+            raise SchemaError(f"{path}: expected a number")
+        if isinstance(value, (int, float)):
+            return int(value) if kind == "integer" else value
+        match = re.search(r"-?\d+(?:\.\d+)?", str(value))
+        if not match:
+            raise SchemaError(f"{path}: expected a number")
+        number = float(match.group())
+        return int(number) if kind == "integer" else number
+
+    if kind == "boolean":
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ("true", "yes", "1", "done", "completed")
+
+    return value
+
+
+def coerce_object_items(value: Any, schema: Dict) -> Any:
+    # Objective lists sometimes come back as plain strings; wrap them into the item object
+    items = schema.get("items", {})
+    if items.get("type") == "object" and isinstance(value, list):
+        first = items.get("required", ["description"])[0]
+        return [{first: v} if isinstance(v, str) else v for v in value]
+    return value
+
+
+class ParseStats:
+    # Per-call-site counts of clean parses, repairs and failures
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sites: Dict[str, Dict[str, int]] = {}
+
+    def record(self, call_site: str, outcome: str):
+        with self._lock:
+            site = self.sites.setdefault(call_site, {"ok": 0, "repaired": 0, "failed": 0})
+            site[outcome] += 1
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            report = {}
+            for call_site, counts in self.sites.items():
+                total = sum(counts.values())
+                report[call_site] = dict(counts, failure_rate=round(counts["failed"] / total, 3) if total else 0.0)
+            return report
+
+
+PARSE_STATS = ParseStats()
+
+
+def parse_structured(text: str, schema: Optional[Dict], call_site: str = "default") -> Any:
+    # Single-pass parse + repair + validation; records the outcome for the failure-rate metric
+    try:
+        value, repaired = parse_json(text)
+        if schema:
+            value = _prepare(value, schema)
+            value = validate(value, schema)
+    except SchemaError:
+        PARSE_STATS.record(call_site, "failed")
+        raise
+    PARSE_STATS.record(call_site, "repaired" if repaired else "ok")
+    return value
+
+
+def _prepare(value: Any, schema: Dict) -> Any:
+    # Apply item coercion to list-of-object properties before validation
+    if isinstance(value, dict) and schema.get("type") == "object":
+        for field, field_schema in schema.get("properties", {}).items():
+            if field_schema.get("type") == "array" and field in value:
+                value[field] = coerce_object_items(value[field], field_schema)
+    return value
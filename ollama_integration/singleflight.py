@@ -0,0 +1,68 @@
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    # Coalesces concurrent identical requests so only one model call runs per key.
+    # The shared concurrent Future lets threads block on it and coroutines await it.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        # Return the in-flight future for key and whether the caller must run it
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["shared"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.stats["calls"] += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        # Run fn once for all threads asking for the same key at the same time
+        future, leader = self._join(key)
+        if not leader:
+            return copy.deepcopy(future.result())  # followers get their own copy to mutate
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        # Async variant: may share a call started by a thread, and vice versa
+        future, leader = self._join(key)
+        if not leader:
+            import asyncio  # kept out of module import so sync-only startup stays fast
+            return copy.deepcopy(await asyncio.wrap_future(future))
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        total = stats["calls"] + stats["shared"]
+        stats["shared_ratio"] = round(stats["shared"] / total, 3) if total else 0.0
+        return stats
@@ -0,0 +1,164 @@
+# Local HTTP stand-in for an Ollama server.
+#
+# Speaks the parts of the Ollama API the game uses (/api/chat, /api/generate,
+# /api/tags, /api/version) and answers with canned replies per call site under a
+# configurable latency/throughput distribution. Point the game at it with OLLAMA_HOST:
+#
+#   python -m ollama_integration.stub_server --port 11435 --latency lognormal:0.8:0.4 --tps 30
+#   OLLAMA_HOST=http://127.0.0.1:11435 python dungeon_master.py
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from .backends import CANNED_RESPONSES, LatencyModel, canned_reply, detect_call_site, split_tokens
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "stand-in"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": [{"name": m} for m in self.server.models]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json({"error": "invalid JSON body"}, status=400)
+            return
+
+        if self.path == "/api/chat":
+            messages = body.get("messages") or []
+            prompt = "\n".join(m.get("content", "") for m in messages)
+            self._answer(body, prompt, chat=True)
+        elif self.path == "/api/generate":
+            self._answer(body, body.get("prompt", ""), chat=False)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _answer(self, body: Dict, prompt: str, chat: bool):
+        model = body.get("model", "stand-in")
+        stream = body.get("stream", True)  # Ollama streams unless told otherwise
+        latency: LatencyModel = self.server.latency
+
+        # An empty generate request is a model load/warm-up
+        text = canned_reply(detect_call_site(prompt), prompt, self.server.responses) if prompt else ""
+        tokens = split_tokens(text)
+        evaluated = self.server.evaluate(model, split_tokens(prompt), tokens)
+        self.server.requests += 1
+
+        if not stream:
+            time.sleep(latency.first_token_delay() + latency.token_delay() * len(tokens))
+            self._send_json(self._frame(model, text, chat, done=True, evaluated=evaluated, tokens=len(tokens)))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            time.sleep(latency.first_token_delay())
+            for token in tokens:
+                self._write_chunk(self._frame(model, token, chat, done=False))
+                time.sleep(latency.token_delay())
+            self._write_chunk(self._frame(model, "", chat, done=True, evaluated=evaluated, tokens=len(tokens)))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client hung up early, as streamed dialogue does
+
+    @staticmethod
+    def _frame(model: str, text: str, chat: bool, done: bool, evaluated: int = 0, tokens: int = 0) -> Dict:
+        frame = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "done": done}
+        if chat:
+            frame["message"] = {"role": "assistant", "content": text}
+        else:
+            frame["response"] = text
+        if done:
+            frame.update({"done_reason": "stop", "prompt_eval_count": evaluated,
+                          "eval_count": tokens})
+        return frame
+
+    def _write_chunk(self, frame: Dict):
+        data = (json.dumps(frame) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 11435), latency: LatencyModel = None,
+                 responses: Dict[str, List[str]] = None, models: List[str] = None, verbose: bool = False):
+        super().__init__(address, StandInHandler)
+        self.latency = latency or LatencyModel()
+        self.responses = responses or CANNED_RESPONSES
+        self.models = models or ["llama3.2:1b", "llama3.2"]
+        self.verbose = verbose
+        self.requests = 0
+        self._kv: Dict[str, List[str]] = {}  # model -> tokens of its last prompt and reply
+        self._kv_lock = threading.Lock()
+
+    def evaluate(self, model: str, prompt: List[str], reply: List[str]) -> int:
+        # Like the real server, only the part of the prompt past what the previous request left
+        # in the model's KV cache is evaluated; returns that count as prompt_eval_count
+        with self._kv_lock:
+            cached = self._kv.get(model, [])
+            shared = 0
+            for a, b in zip(cached, prompt):
+                if a != b:
+                    break
+                shared += 1
+            self._kv[model] = prompt + reply
+        return len(prompt) - shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic Ollama stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="first-token latency: fixed:S, uniform:MEAN:HALFWIDTH or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--tps", type=float, default=0.0, help="tokens per second after the first (0 = instant)")
+    parser.add_argument("--responses", help="JSON file mapping call site -> list of replies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            responses = {**CANNED_RESPONSES, **json.load(f)}
+
+    server = StandInServer((args.host, args.port), LatencyModel.parse(args.latency, args.tps, args.seed),
+                           responses, verbose=args.verbose)
+    print(f"Ollama stand-in listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
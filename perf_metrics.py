@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Union
+
+MAX_SAMPLES = 2000  # latency samples kept per site for percentiles
+
+
+class _SiteStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.counters: Dict[str, int] = {}
+
+
+class PerfRegistry:
+    # Latency and counter metrics per call site (LLM calls, file I/O, game phases)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites: Dict[str, _SiteStats] = {}
+        self.started_at = time.time()
+
+    def record(self, site: str, seconds: float, **counters: int):
+        # One timed event plus any counters that go with it
+        with self._lock:
+            stats = self._sites.setdefault(site, _SiteStats())
+            stats.count += 1
+            stats.total += seconds
+            stats.samples.append(seconds)
+            for name, value in counters.items():
+                if value:
+                    stats.counters[name] = stats.counters.get(name, 0) + int(value)
+
+    def incr(self, site: str, counter: str, value: int = 1):
+        # Counter without a latency sample (retries, tokens, cache hits, ...)
+        with self._lock:
+            stats = self._sites.setdefault(site, _SiteStats())
+            stats.counters[counter] = stats.counters.get(counter, 0) + int(value)
+
+    @contextmanager
+    def measure(self, site: str):
+        # Time a block; the block may add counters to the yielded dict
+        counters: Dict[str, int] = {}
+        started = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            self.record(site, time.perf_counter() - started, **counters)
+
+    def totals(self, sites: List[str]) -> Dict[str, int]:
+        # Event count and summed counters over several sites (diff two calls to cost an operation)
+        with self._lock:
+            totals = {"count": 0}
+            for site in sites:
+                stats = self._sites.get(site)
+                if stats is None:
+                    continue
+                totals["count"] += stats.count
+                for name, value in stats.counters.items():
+                    totals[name] = totals.get(name, 0) + value
+            return totals
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            report = {}
+            for site, stats in sorted(self._sites.items()):
+                samples = sorted(stats.samples)
+                report[site] = {
+                    "count": stats.count,
+                    "mean_ms": round(stats.total / stats.count * 1000, 2) if stats.count else 0.0,
+                    "p50_ms": _percentile_ms(samples, 50),
+                    "p95_ms": _percentile_ms(samples, 95),
+                    "p99_ms": _percentile_ms(samples, 99),
+                    **stats.counters
+                }
+            return report
+
+    def report(self, prefix: str = "") -> str:
+        # Fixed-width table for the in-game `perf` command
+        rows = [(site, s) for site, s in self.snapshot().items() if site.startswith(prefix)]
+        if not rows:
+            return "No measurements yet."
+        width = max(len(site) for site, _ in rows)
+        lines = [f"{'site'.ljust(width)}  {'n':>5} {'p50':>8} {'p95':>8} {'p99':>8}  counters"]
+        for site, s in rows:
+            extras = ", ".join(f"{k}={v}" for k, v in s.items()
+                               if k not in ("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"))
+            lines.append(f"{site.ljust(width)}  {s['count']:>5} {s['p50_ms']:>7}ms {s['p95_ms']:>7}ms "
+                         f"{s['p99_ms']:>7}ms  {extras}")
+        return "\n".join(lines)
+
+    def dump(self, path: Union[str, Path], extra: Dict = None) -> bool:
+        # Write a JSON snapshot for dashboards
+        data = {"started_at": self.started_at, "dumped_at": time.time(), "sites": self.snapshot()}
+        if extra:
+            data.update(extra)
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, default=str)
+            return True
+        except Exception as e:
+            print(f"[Error] Failed to write metrics to {path}: {e}")
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+            self.started_at = time.time()
+
+
+def _percentile_ms(samples: List[float], pct: float) -> float:
+    # Nearest-rank percentile of pre-sorted samples, in milliseconds
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples) + 0.5)) - 1))
+    return round(samples[rank] * 1000, 2)
+
+
+# Process-wide registry shared by every module
+PERF = PerfRegistry()
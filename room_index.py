@@ -0,0 +1,248 @@
+import json
+import os
+import threading
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from file_manager import FileManager
+from perf_metrics import PERF
+from write_behind import WRITER, atomic_write_text
+
+MANIFEST_NAME = "room_index.json"  # lives in data/, outside the dungeons folder it describes
+MANIFEST_VERSION = 1
+FILE_STAMPS_KEY = "dungeon_files"  # store meta entry: room file -> mtime of the version imported
+
+# Rooms whose hand-written exits are never rewritten by the reverse-exit pass
+PROTECTED_ROOMS = {"entrance", "hallway1", "chamber1"}
+OPPOSITES = {'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east', 'up': 'down', 'down': 'up'}
+
+
+def _summary(room: Dict, filename: str) -> Dict:
+    # The part of a room kept in the manifest
+    return {
+        "file": filename,
+        "name": room.get("name", "Unnamed Room"),
+        "type": room.get("type", "chamber"),
+        "depth": room.get("depth", 0),
+        "exits": dict(room.get("exits", {}))
+    }
+
+
+class RoomIndex:
+    # Persisted id -> {file, name, type, depth, exits} manifest of the saved rooms, kept either
+    # as data/room_index.json next to one JSON file per room or as the columns of a RoomStore
+    def __init__(self, file_manager: FileManager, store: Optional["RoomStore"] = None):
+        self.file_manager = file_manager
+        self.store = store
+        self.path = file_manager.data_path / MANIFEST_NAME
+        self.entries: Dict[str, Dict] = {}
+        self.rebuilt = False
+        self._changed: set = set()  # ids whose manifest exits changed since the last persist
+        self._lock = threading.RLock()
+
+    def load(self):
+        # Read the manifest; rebuild it from the room files only when the folder changed
+        with PERF.measure("io.room_index_load") as counters:
+            if self.store is not None:
+                self.entries = self.store.summaries()
+                counters["imports"] = self._sync_store()
+                return
+            manifest = self.file_manager.read_json(self.file_manager.data_path, MANIFEST_NAME) \
+                if self.path.exists() else None
+            if manifest and manifest.get("version") == MANIFEST_VERSION \
+                    and manifest.get("dungeons_mtime") == self._dungeons_mtime():
+                self.entries = manifest["rooms"]
+                return
+            counters["rebuilds"] = 1
+            self.rebuild()
+
+    def rebuild(self):
+        # Full scan: parse every room file once and apply reverse exits over the summaries
+        rooms, _ = self._scan(self.file_manager.dungeons_path)
+        with self._lock:
+            self.entries = rooms
+            for room_id in list(rooms):
+                self._link_reverse_exits(room_id)
+            self.rebuilt = True
+            self.save()
+
+    def _sync_store(self) -> int:
+        # Import room files that are new or changed since the store last took them in (first run, a
+        # git pull, a designer's edit); returns how many were imported. Rooms whose file was
+        # deleted stay in the store, as generated rooms never had a file to begin with.
+        stamps = self._file_stamps()
+        recorded = self.store.get_meta(FILE_STAMPS_KEY)
+        if recorded is None and self.entries:
+            # Store filled before stamps were kept: it came from these files, so they're the baseline
+            self.store.write([], meta={FILE_STAMPS_KEY: json.dumps(stamps)})
+            return 0
+        recorded = json.loads(recorded) if recorded else {}
+        changed = [name for name, stamp in stamps.items() if recorded.get(name) != stamp]
+        if changed:
+            if self.entries:
+                print(f"Room files changed since the last run, re-importing: {', '.join(sorted(changed))}")
+            self.import_json(self.file_manager.dungeons_path, changed, meta={FILE_STAMPS_KEY: json.dumps(stamps)})
+        elif set(recorded) != set(stamps):
+            self.store.write([], meta={FILE_STAMPS_KEY: json.dumps(stamps)})
+        return len(changed)
+
+    def _file_stamps(self) -> Dict[str, int]:
+        stamps = {}
+        for name in self.file_manager.list_dungeon_files():
+            try:
+                stamps[name] = os.stat(self.file_manager.dungeons_path / name).st_mtime_ns
+            except OSError:
+                continue
+        return stamps
+
+    def import_json(self, directory: Path, files: List[str] = None, meta: Dict[str, str] = None) -> int:
+        # Copy a folder of room files (or just the given ones) into the store in one transaction
+        rooms, bodies = self._scan(directory, files)
+        with self._lock:
+            self.entries.update(rooms)
+            touched = set(rooms)
+            for room_id in rooms:
+                touched.update(self._link_reverse_exits(room_id))
+            for room_id, entry in self.entries.items():
+                # Rooms already stored that lead into a re-imported one get their way back again
+                if room_id not in rooms and any(target in rooms for target in entry["exits"].values()
+                                                if isinstance(target, str)):
+                    touched.update(self._link_reverse_exits(room_id))
+            self._changed.clear()
+            self.store.write(bodies, {room_id: self.entries[room_id] for room_id in touched}, meta=meta)
+            self.rebuilt = True
+        return len(bodies)
+
+    def _scan(self, directory: Path, files: List[str] = None) -> Tuple[Dict[str, Dict], List[Dict]]:
+        rooms, bodies = {}, []
+        files = files if files is not None else self.file_manager.list_files(directory, ".json")
+        for room_file in ["entrance.json"] + [f for f in files if f != "entrance.json"]:
+            if room_file not in files:
+                continue
+            room_data = self.file_manager.read_json(directory, room_file)
+            if room_data:
+                rooms[room_data['id']] = _summary(room_data, room_file)
+                bodies.append(room_data)
+        return rooms, bodies
+
+    def persist(self, rooms: List[Dict]) -> bool:
+        # Write room bodies plus any manifest exits they changed; one transaction on the store
+        with self._lock:
+            changed = {room_id: self.entries[room_id] for room_id in self._changed if room_id in self.entries}
+            self._changed.clear()
+        if self.store is not None:
+            return self.store.write(rooms, changed, background=True)
+        ok = True
+        for room in rooms:
+            ok = self.file_manager.write_json(self.entries[room['id']]["file"], room) and ok
+        return self.save() and ok
+
+    def read(self, room_id: str, entry: Dict) -> Optional[Dict]:
+        if self.store is not None:
+            return self.store.get(room_id)
+        return self.file_manager.read_json(entry["file"])
+
+    def save(self) -> bool:
+        if self.store is not None:
+            return True  # the store's columns are the manifest
+        # Queued behind the room files so the recorded folder mtime is taken after they land
+        WRITER.submit(str(self.path), self._write_manifest)
+        return True
+
+    def _write_manifest(self):
+        with self._lock:
+            manifest = {"version": MANIFEST_VERSION, "dungeons_mtime": self._dungeons_mtime(), "rooms": self.entries}
+            text = json.dumps(manifest, indent=2)
+        atomic_write_text(self.path, text)
+
+    def update(self, room: Dict, filename: str = None) -> Dict[str, str]:
+        # Record a new or changed room; returns reverse exits added to other rooms (target id -> direction)
+        with self._lock:
+            old = self.entries.get(room['id'], {})
+            self.entries[room['id']] = _summary(room, filename or old.get("file") or f"{room['id']}.json")
+            added = self._link_reverse_exits(room['id'])
+            self._changed.update(added)
+            return added
+
+    def _link_reverse_exits(self, room_id: str) -> Dict[str, str]:
+        # Every plain exit from room_id gets a way back unless the target already uses that side
+        added = {}
+        if room_id in PROTECTED_ROOMS:
+            return added
+        for direction, target in self.entries[room_id]["exits"].items():
+            if isinstance(target, str) and target in self.entries and direction in OPPOSITES:
+                reverse = OPPOSITES[direction]
+                if reverse not in self.entries[target]["exits"]:
+                    self.entries[target]["exits"][reverse] = room_id
+                    added[target] = reverse
+        return added
+
+    def _dungeons_mtime(self) -> int:
+        # Changes whenever a room file is added, removed or renamed
+        try:
+            return os.stat(self.file_manager.dungeons_path).st_mtime_ns
+        except OSError:
+            return 0
+
+
+class LazyRoomMap(MutableMapping):
+    # dict-like view of all rooms; bodies are read from disk on first access
+    def __init__(self, index: RoomIndex):
+        self.index = index
+        self._loaded: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, room_id: str) -> Dict:
+        room = self._loaded.get(room_id)
+        if room is not None:
+            return room
+        entry = self.index.entries.get(room_id)
+        if entry is None:
+            raise KeyError(room_id)
+        with self._lock:
+            room = self._loaded.get(room_id)
+            if room is None:
+                room = self._load(room_id, entry)
+                self._loaded[room_id] = room
+        return room
+
+    def _load(self, room_id: str, entry: Dict) -> Dict:
+        with PERF.measure("io.room_load"):
+            room = self.index.read(room_id, entry)
+        if not room:
+            raise KeyError(room_id)
+        # Reverse exits were worked out in the manifest; fill in the ones the file lacks
+        exits = room.setdefault('exits', {})
+        for direction, target in entry["exits"].items():
+            exits.setdefault(direction, target)
+        return room
+
+    def __setitem__(self, room_id: str, room: Dict):
+        self._loaded[room_id] = room
+        for target, reverse in self.index.update(room).items():
+            if target in self._loaded:
+                self._loaded[target].setdefault('exits', {}).setdefault(reverse, room_id)
+
+    def __delitem__(self, room_id: str):
+        self._loaded.pop(room_id, None)
+        with self.index._lock:
+            del self.index.entries[room_id]
+
+    def __contains__(self, room_id) -> bool:
+        return room_id in self.index.entries
+
+    def __iter__(self) -> Iterator[str]:
+        with self.index._lock:
+            return iter(list(self.index.entries))
+
+    def __len__(self) -> int:
+        return len(self.index.entries)
+
+    def loaded_count(self) -> int:
+        return len(self._loaded)
+
+    def names(self) -> Dict[str, str]:
+        # Room names straight from the manifest, without loading any room bodies
+        with self.index._lock:
+            return {room_id: entry["name"] for room_id, entry in self.index.entries.items()}
@@ -0,0 +1,162 @@
+# Packed room storage: every room in one SQLite file instead of one JSON file per room.
+#
+# Rows keep the manifest fields (name, type, depth, exits with reverse exits
+# applied) next to the full room body, so startup reads the small columns and
+# bodies are fetched by primary key on first access. Import/export convert
+# to and from the data/dungeons/*.json layout:
+#
+#   python room_store.py export data/dungeons_export
+#   python room_store.py import data/dungeons
+import argparse
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from perf_metrics import PERF
+from write_behind import WRITER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    depth INTEGER NOT NULL DEFAULT 0,
+    exits TEXT NOT NULL,
+    body TEXT NOT NULL
+)
+"""
+
+# Small key/value facts about the store itself (e.g. which room file versions were imported)
+META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+)
+"""
+
+
+class RoomStore:
+    # SQLite-backed room table; every write call is one transaction
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.execute(META_SCHEMA)
+        self._conn.commit()
+
+    def summaries(self) -> Dict[str, Dict]:
+        # Manifest view of every room without reading any bodies
+        with self._lock:
+            rows = self._conn.execute("SELECT id, name, type, depth, exits FROM rooms").fetchall()
+        return {room_id: {"name": name, "type": room_type, "depth": depth, "exits": json.loads(exits)}
+                for room_id, name, room_type, depth, exits in rows}
+
+    def get(self, room_id: str) -> Optional[Dict]:
+        with PERF.measure("io.store_get"), self._lock:
+            row = self._conn.execute("SELECT body FROM rooms WHERE id = ?", (room_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def write(self, rooms: Iterable[Dict], summaries: Dict[str, Dict] = None, background: bool = False,
+              meta: Dict[str, str] = None) -> bool:
+        # Upsert room bodies and refresh manifest exits of other rooms (and any meta values), all in a
+        # single transaction. Rows are serialized immediately; with background=True the transaction
+        # runs on the writer thread.
+        rooms = list(rooms)
+        summaries = summaries or {}
+        meta_rows = list((meta or {}).items())
+        with PERF.measure("io.store_write") as counters:
+            upserts = [(room['id'], room.get('name', 'Unnamed Room'), room.get('type', 'chamber'), room.get('depth', 0),
+                        json.dumps(summaries.get(room['id'], room).get("exits", {})),
+                        json.dumps(room, separators=(",", ":")))
+                       for room in rooms]
+            written = {room['id'] for room in rooms}
+            exit_updates = [(json.dumps(summary["exits"]), room_id)
+                            for room_id, summary in summaries.items() if room_id not in written]
+            counters["bytes"] = sum(len(row[5]) for row in upserts)
+            counters["rooms"] = len(rooms)
+        if background:
+            WRITER.submit(None, lambda: self._commit(upserts, exit_updates, meta_rows))
+            return True
+        return self._commit(upserts, exit_updates, meta_rows)
+
+    def _commit(self, upserts: List[Tuple], exit_updates: List[Tuple], meta_rows: List[Tuple] = ()) -> bool:
+        with PERF.measure("io.store_commit") as counters, self._lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO rooms (id, name, type, depth, exits, body) VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET name = excluded.name, type = excluded.type, "
+                        "depth = excluded.depth, exits = excluded.exits, body = excluded.body",
+                        upserts
+                    )
+                    self._conn.executemany("UPDATE rooms SET exits = ? WHERE id = ?", exit_updates)
+                    self._conn.executemany(
+                        "INSERT INTO meta (key, value) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                        meta_rows
+                    )
+                return True
+            except sqlite3.Error as e:
+                counters["errors"] = 1
+                print(f"[Error] Failed to write rooms to {self.path}: {e}")
+                return False
+
+    def delete(self, room_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rooms").fetchone()[0]
+
+    def export_json_dir(self, directory: Union[str, Path]) -> int:
+        # Write each room back out as <id>.json in the original pretty-printed layout
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            rows = self._conn.execute("SELECT id, body FROM rooms").fetchall()
+        for room_id, body in rows:
+            with open(directory / f"{room_id}.json", "w", encoding="utf-8") as f:
+                json.dump(json.loads(body), f, indent=2)
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    from file_manager import FileManager
+    from room_index import RoomIndex
+
+    parser = argparse.ArgumentParser(description="Import or export the packed room store")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("directory", nargs="?", help="room JSON folder (default: data/dungeons)")
+    args = parser.parse_args()
+
+    file_manager = FileManager()
+    store = RoomStore(file_manager.room_store_path)
+    directory = Path(args.directory) if args.directory else file_manager.dungeons_path
+    if args.action == "import":
+        # Through the index so reverse exits are worked out the same way as at startup
+        index = RoomIndex(file_manager, store)
+        index.entries = store.summaries()
+        print(f"Imported {index.import_json(directory)} rooms into {store.path}")
+    else:
+        print(f"Exported {store.export_json_dir(directory)} rooms to {directory}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
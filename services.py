@@ -0,0 +1,88 @@
+import pathlib
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+from dungeon import Dungeon
+from entity_resolver import EntityResolver
+from file_manager import FileManager
+from generators.smart_dungeon_gen import SmartDungeonGenerator
+from generators.room_prefetcher import RoomPrefetcher
+from ollama_integration import ROUTER, start_warm_up
+from ai_systems.npc import NPCHandler
+from ai_systems.quests import QuestGenerator
+from ai_systems.puzzles import PuzzleGenerator
+from ai_systems.combat import TacticalCombatAI
+from ai_systems.memory_summarizer import MemorySummarizer
+from perf_metrics import PERF
+
+
+class StartupReport:
+    # Wall time of each startup phase, in the order they ran
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+        PERF.record(f"startup.{name}", seconds)
+
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def describe(self) -> str:
+        parts = ", ".join(f"{name} {seconds * 1000:.1f}" for name, seconds in self.phases)
+        return f"Startup: {self.total() * 1000:.1f} ms ({parts})"
+
+    def as_dict(self) -> dict:
+        return {name: round(seconds * 1000, 2) for name, seconds in self.phases}
+
+
+class Services:
+    # Everything the game needs that is built once at startup and shared by reference
+    def __init__(self, game_root: pathlib.Path, startup: StartupReport = None):
+        self.startup = startup or StartupReport()
+
+        with self.startup.phase("file_manager"):
+            self.file_manager = FileManager(game_root)
+        with self.startup.phase("npcs"):
+            npc_file = self.file_manager.npcs_path / "npc_storage.json"
+            if not npc_file.exists():
+                npc_file.write_text("{}", encoding="utf-8")
+            self.npc_handler = NPCHandler(str(npc_file))
+        with self.startup.phase("dungeon"):
+            self.dungeon = Dungeon(self.file_manager, self.npc_handler)
+        with self.startup.phase("resolver"):
+            self.resolver = EntityResolver()
+            self.resolver.index_npcs(self.npc_handler.npcs)
+            self.resolver.index_items(self.dungeon.item_system.items.values())
+        with self.startup.phase("generator"):
+            self.room_generator = SmartDungeonGenerator(self.dungeon, self.file_manager)
+            self.prefetcher = RoomPrefetcher(self.room_generator)
+        with self.startup.phase("systems"):
+            self.quest_system = QuestGenerator(self.npc_handler)
+            self.puzzle_system = PuzzleGenerator()
+            self.combat_ai = TacticalCombatAI()
+            self.summarizer = MemorySummarizer(self.npc_handler)
+        with self.startup.phase("warm_up"):
+            # Load every model we use in the background so the first move doesn't pay for it
+            models = ROUTER.models()
+            if self.puzzle_system.model:
+                models.append(self.puzzle_system.model)
+            start_warm_up(models)
+
+    def new_world(self) -> Tuple[Dungeon, SmartDungeonGenerator, RoomPrefetcher]:
+        # Fresh dungeon state (after loading a save) on the same shared services
+        self.prefetcher.shutdown()
+        self.file_manager.flush()  # rooms saved this session must be readable by the new Dungeon
+        self.dungeon = Dungeon(self.file_manager, self.npc_handler)
+        self.room_generator = SmartDungeonGenerator(self.dungeon, self.file_manager)
+        self.prefetcher = RoomPrefetcher(self.room_generator)
+        return self.dungeon, self.room_generator, self.prefetcher
@@ -0,0 +1,106 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+from perf_metrics import PERF
+
+
+def atomic_write_text(path: Union[str, Path], text: str):
+    # Write to a temp file in the same folder, fsync, then rename over the target
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)  # readers see either the old file or the new one, never half of it
+
+
+class WriteBehindQueue:
+    # Single background writer: jobs run in submission order; a newer job for the same
+    # key replaces the payload of one still waiting, in that job's place in the queue,
+    # so rapid saves of one file cost one write and never overtake later writes
+    def __init__(self):
+        self._jobs: "OrderedDict[object, Callable[[], None]]" = OrderedDict()
+        self._texts: Dict[str, str] = {}  # path -> text not yet on disk, for read-after-write
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._seq = 0
+        self.stats = {"submitted": 0, "coalesced": 0, "written": 0, "errors": 0}
+
+    def submit(self, key, job: Callable[[], None]):
+        # key=None never coalesces (e.g. database transactions)
+        with self._cond:
+            self.stats["submitted"] += 1
+            if key is None:
+                self._seq += 1
+                key = ("job", self._seq)
+            elif key in self._jobs:
+                self.stats["coalesced"] += 1
+            self._jobs[key] = job  # an existing key keeps its position
+            self._start()
+            self._cond.notify_all()
+
+    def write_text(self, path: Union[str, Path], text: str):
+        path = str(Path(path))
+        with self._cond:
+            self._texts[path] = text
+        self.submit(path, lambda: self._write_file(path, text))
+
+    def pending_text(self, path: Union[str, Path]) -> Optional[str]:
+        with self._cond:
+            return self._texts.get(str(Path(path)))
+
+    def flush(self, timeout: float = None) -> bool:
+        # Barrier: block until everything submitted so far is on disk
+        with PERF.measure("io.flush"), self._cond:
+            return self._cond.wait_for(lambda: not self._jobs and not self._busy, timeout)
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            stats = dict(self.stats)
+            stats["queued"] = len(self._jobs)
+        return stats
+
+    def _write_file(self, path: str, text: str):
+        try:
+            with PERF.measure("io.write_behind") as counters:
+                atomic_write_text(path, text)
+                counters["bytes"] = len(text)
+        finally:
+            with self._cond:
+                if self._texts.get(path) is text:
+                    del self._texts[path]
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._jobs)
+                key, job = self._jobs.popitem(last=False)
+                self._busy = True
+            outcome = "written"
+            try:
+                job()
+            except Exception as e:
+                outcome = "errors"
+                print(f"[Error] Background write failed for {key}: {e}")
+            finally:
+                with self._cond:
+                    self.stats[outcome] += 1
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+# Shared by every FileManager, the save-game module and the room store so writes stay ordered
+WRITER = WriteBehindQueue()
+atexit.register(WRITER.flush)